@@ -0,0 +1,58 @@
+import pygame
+
+
+class ImageCache:
+    def __init__(self):
+        """
+            A cache of the images used by the game, keyed by their path and
+            the size they are scaled to. Every file is read from disk only
+            once, no matter how many sizes it is scaled to.
+
+            Attributes:
+            - originals (dict): The images as loaded from disk, by path.
+            - images (dict): The scaled images, by (path, size).
+            - disk_loads (int): The number of files read from disk.
+            - hits (int): The number of requests served from the cache.
+        """
+        self.originals = {}
+        self.images = {}
+        self.disk_loads = 0
+        self.hits = 0
+
+    def get(self, path, size):
+        """
+            Returns the image at the given path scaled to the given size,
+            loading and scaling it only if it is not cached yet.
+
+            Parameters:
+            - path (str): The file path of the image.
+            - size (tuple): The (width, height) the image is scaled to.
+        """
+        key = (path, size)
+        img = self.images.get(key)
+        if img is not None:
+            self.hits += 1
+            return img
+
+        original = self.originals.get(path)
+        if original is None:
+            original = pygame.image.load(path)
+            self.originals[path] = original
+            self.disk_loads += 1
+        img = pygame.transform.scale(original, size)
+        self.images[key] = img
+        return img
+
+    def preload(self, paths, size):
+        """
+            Loads and scales the images at the given paths ahead of time.
+
+            Parameters:
+            - paths (iterable): The file paths of the images.
+            - size (tuple): The (width, height) the images are scaled to.
+        """
+        for path in paths:
+            self.get(path, size)
+
+
+IMAGE_CACHE = ImageCache()
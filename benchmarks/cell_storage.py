@@ -0,0 +1,69 @@
+"""
+    Compares the memory and construction time of the packed cells of
+    Minesweeper with a grid of one object per cell, as the game used before.
+
+    Run with: python -m benchmarks.cell_storage
+"""
+import random
+import timeit
+import tracemalloc
+
+from game_options import EASY, MEDIUM, HARD, GameOptions
+from minesweeper import Minesweeper, CellStatus
+
+SIZES = {
+    'easy': EASY,
+    'medium': MEDIUM,
+    'hard': HARD,
+    '64x30': GameOptions(64, 30, 400),
+}
+
+
+class ObjectSquare:
+    def __init__(self, position, status, is_bomb):
+        self.position = position
+        self.status = status
+        self.is_bomb = is_bomb
+        self.is_opened = False
+
+
+def build_object_grid(game_options):
+    width, height = game_options.grid_width, game_options.grid_height
+    bombs_pos = set(random.sample(range(width * height),
+                                  game_options.bombs_no))
+    return [[ObjectSquare((j * 20.0, i * 20.0 + 60.0), CellStatus.UNKNOWN,
+                          i * width + j in bombs_pos)
+             for j in range(width)]
+            for i in range(height)]
+
+
+def build_packed_board(game_options):
+    return Minesweeper(game_options.grid_width, game_options.grid_height,
+                       game_options.bombs_no)
+
+
+def measure_memory(build, game_options):
+    tracemalloc.start()
+    board = build(game_options)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del board
+    return size
+
+
+def measure_time(build, game_options, number=200):
+    return timeit.timeit(lambda: build(game_options), number=number) / number
+
+
+def main():
+    print(f'{"size":>8} {"storage":>8} {"bytes":>10} {"build (us)":>11}')
+    for name, game_options in SIZES.items():
+        for storage, build in (('objects', build_object_grid),
+                               ('packed', build_packed_board)):
+            size = measure_memory(build, game_options)
+            build_time = measure_time(build, game_options) * 1e6
+            print(f'{name:>8} {storage:>8} {size:>10} {build_time:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
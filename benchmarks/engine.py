@@ -0,0 +1,253 @@
+"""
+    Times the hot paths of the engine and of the renderer on the standard
+    difficulties and on large custom boards, and compares the results with a
+    stored baseline. The renderer runs headless with SDL's dummy video driver.
+
+    Run with: python -m benchmarks.engine [--output results.json]
+    Store the results as the new baseline with --save-baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from game_options import EASY, MEDIUM, HARD, GameOptions
+from minesweeper import Minesweeper, BOMB_BIT
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+THRESHOLD = 1.25
+MIN_TIME = 0.2
+MIN_RUNS = 3
+MAX_TIME = 5
+SEED = 0
+
+SIZES = {
+    'easy': EASY,
+    'medium': MEDIUM,
+    'hard': HARD,
+    '64x30': GameOptions(64, 30, 400),
+    '256x256': GameOptions(256, 256, 13500),
+    '1000x1000': GameOptions(1000, 1000, 206000),
+}
+
+
+def measure(function, setup=None, number=1):
+    """
+        Times a function, calling it until it ran at least MIN_RUNS times and
+        for MIN_TIME seconds, or for MAX_TIME seconds counting the setup.
+
+        Parameters:
+        - function (function): The function to time, called with the
+         arguments returned by setup.
+        - setup (function, optional): Returns a tuple of arguments for each
+         call, and is not timed, default None for no arguments.
+        - number (int, optional): The number of operations done by one call
+         of function, default 1.
+
+        Returns:
+        - float: The median time of an operation in seconds.
+    """
+    times = []
+    started = time.perf_counter()
+    while len(times) < MIN_RUNS or (
+            sum(times) < MIN_TIME
+            and time.perf_counter() - started < MAX_TIME):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) / number
+
+
+def new_game(game_options, first_click_safe=False):
+    return Minesweeper(game_options.grid_width, game_options.grid_height,
+                       game_options.bombs_no, seed=SEED,
+                       first_click_safe=first_click_safe)
+
+
+def find_empty_square(game):
+    """
+        Returns the position of the first square with no bombs near it, from
+        which opening cascades.
+    """
+    for index, cell in enumerate(game.bombs_near):
+        if cell == 0 and not game.cells[index] & BOMB_BIT:
+            return divmod(index, game.GRID_WIDTH)
+    raise ValueError('the board has no empty square')
+
+
+def bench_construction(game_options):
+    return measure(lambda: new_game(game_options))
+
+
+def bench_generate_bombs(game_options):
+    game = new_game(game_options, first_click_safe=True)
+    return measure(game.generate_bombs)
+
+
+def bench_compute_bombs_near(game_options):
+    game = new_game(game_options)
+    positions = [(line, col) for line in range(game.GRID_HEIGHT)
+                 for col in range(game.GRID_WIDTH)]
+
+    def look_up_all():
+        for line, col in positions:
+            game.compute_bombs_near(line, col)
+
+    return measure(look_up_all, number=len(positions))
+
+
+def bench_reveal_safe_cells(game_options):
+    def setup():
+        game = new_game(game_options)
+        line, col = find_empty_square(game)
+        game.open_square(line, col, game.get_status(line, col))
+        return game, line, col
+
+    return measure(lambda game, line, col: game.reveal_safe_cells(line, col),
+                   setup)
+
+
+def bench_is_won(game_options):
+    game = new_game(game_options)
+    calls = range(10000)
+
+    def call_is_won():
+        for _ in calls:
+            game.is_won()
+
+    return measure(call_is_won, number=len(calls))
+
+
+def bench_full_draw(game_options):
+    handler = new_game_handler(game_options)
+
+    def full_draw():
+        handler.needs_full_redraw = True
+        handler.draw()
+
+    return measure(full_draw)
+
+
+def bench_idle_draw(game_options):
+    handler = new_game_handler(game_options)
+    handler.draw()
+    draws = range(100)
+
+    def draw_idle():
+        for _ in draws:
+            handler.draw()
+
+    return measure(draw_idle, number=len(draws))
+
+
+def new_game_handler(game_options):
+    """
+        Creates a game handler, and stops its board pool so that the boards
+        generated in the background don't slow down the measures.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import gamehandler
+    handler = gamehandler.GameHandler(game_options)
+    handler.board_pool.stop(wait=True)
+    return handler
+
+
+BENCHMARKS = {
+    'construction': bench_construction,
+    'generate_bombs': bench_generate_bombs,
+    'compute_bombs_near': bench_compute_bombs_near,
+    'reveal_safe_cells': bench_reveal_safe_cells,
+    'is_won': bench_is_won,
+    'draw_full': bench_full_draw,
+    'draw_idle': bench_idle_draw,
+}
+
+
+def run(benchmarks, sizes):
+    """
+        Runs the given benchmarks on the given sizes, printing each result.
+
+        Returns:
+        - dict: The median times in seconds, by benchmark and by size.
+    """
+    results = {}
+    for name in benchmarks:
+        results[name] = {}
+        for size in sizes:
+            seconds = BENCHMARKS[name](SIZES[size])
+            results[name][size] = seconds
+            print(f'{name:>20} {size:>10} {seconds * 1e6:>14.3f} us')
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+        Compares results with a baseline, printing the ratio of every time
+        found in both.
+
+        Returns:
+        - list: The (benchmark, size, ratio) of the times which are more than
+         threshold times slower than the baseline.
+    """
+    regressions = []
+    for name, times in results.items():
+        for size, seconds in times.items():
+            baseline_seconds = baseline.get(name, {}).get(size)
+            if not baseline_seconds:
+                continue
+            ratio = seconds / baseline_seconds
+            flag = '  REGRESSION' if ratio > threshold else ''
+            print(f'{name:>20} {size:>10} {ratio:>8.2f}x{flag}')
+            if ratio > threshold:
+                regressions.append((name, size, ratio))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Times the engine and the renderer.')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS,
+                        default=list(BENCHMARKS))
+    parser.add_argument('--sizes', nargs='+', choices=SIZES,
+                        default=list(SIZES))
+    parser.add_argument('--output', help='file the results are saved to')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help='results to compare with')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='slowdown ratio reported as a regression')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': run(args.benchmarks, args.sizes),
+    }
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        print(f'\ncompared with {args.baseline}:')
+        regressions = compare(report['results'], baseline['results'],
+                              args.threshold)
+        print(f'{len(regressions)} regressions')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
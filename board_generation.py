@@ -0,0 +1,296 @@
+import queue
+import random
+import threading
+from collections import OrderedDict
+from enum import Enum
+
+from game_logging import LOGGER
+from minesweeper import (Minesweeper, STATUSES, BOMB_BIT, OPENED_BIT,
+                         numpy_backend)
+from solver import Solver
+
+MAX_POOLS = 4
+# smaller boards can leave a guess at their ends which no move of the bombs
+# avoids, and the start square needs its 3x3 area free
+NO_GUESS_MIN_SIZE = 3
+NO_GUESS_FREE_CELLS = 9
+
+POOLS = OrderedDict()
+
+
+class Generation(Enum):
+    RANDOM = 0
+    FIRST_CLICK_SAFE = 1
+    NO_GUESS = 2
+
+
+def create_board(game_options, seed, generation=Generation.RANDOM,
+                 use_numpy=False):
+    """
+        Creates a board, the same one for the same options, seed and
+        generation mode.
+
+        Parameters:
+        - game_options (GameOptions): The configuration of the board.
+        - seed (int): The seed of the board.
+        - generation (Generation, optional): How the bombs are placed,
+         default Generation.RANDOM.
+        - use_numpy (bool, optional): Generates random boards with NumPy,
+         default False.
+    """
+    if generation == Generation.NO_GUESS:
+        return create_no_guess_board(game_options, seed)
+    first_click_safe = generation == Generation.FIRST_CLICK_SAFE
+    return Minesweeper(game_options.grid_width, game_options.grid_height,
+                       game_options.bombs_no, seed=seed, use_numpy=use_numpy,
+                       first_click_safe=first_click_safe)
+
+
+def can_generate_no_guess(game_options):
+    """
+        Tells if boards which can be won without guessing can be generated
+        for the given options.
+    """
+    return (min(game_options.grid_width, game_options.grid_height)
+            >= NO_GUESS_MIN_SIZE
+            and game_options.bombs_no <= game_options.grid_width
+            * game_options.grid_height - NO_GUESS_FREE_CELLS)
+
+
+def play(game, solver, revealed=()):
+    """
+        Plays a game with the solver, opening every cell it finds safe until
+        the game is won or no safe cell is left.
+
+        Parameters:
+        - game (Minesweeper): The game, with its start square opened.
+        - solver (Solver): The solver of the game.
+        - revealed (list, optional): The cells opened since the solver was
+         last updated, default none.
+
+        Returns:
+        - bool: Whether the game was won.
+    """
+    while not game.is_over and not game.is_won():
+        solver.update(revealed)
+        safe, _ = solver.find_moves()
+        if not safe:
+            return False
+        revealed = []
+        for safe_line, safe_col in safe:
+            revealed += game.open(safe_line, safe_col)
+    return game.is_won()
+
+
+def find_repair(game, solver, rng):
+    """
+        Chooses bombs to move so that a stuck solver can go on: the bombs
+        among the undecided cells around one of the opened numbers, which
+        then has only safe cells left, or one of the bombs the solver found
+        if no number is undecided. They are moved to interior cells, which no
+        opened cell touches.
+
+        Returns:
+        - tuple: The indexes of the bombs to move and of the cells to move
+         them to, None if there are not enough interior cells left.
+    """
+    if solver.constraints:
+        key = rng.choice(sorted(solver.constraints))
+        moved = [index for index in sorted(solver.constraints[key].cells)
+                 if game.cells[index] & BOMB_BIT]
+    else:
+        moved = [rng.choice(sorted(solver.mines))]
+    interior = [index for index, cell in enumerate(game.cells)
+                if not cell & (OPENED_BIT | BOMB_BIT)
+                and index not in solver.watchers]
+    if len(interior) < len(moved):
+        return None
+    return moved, rng.sample(interior, len(moved))
+
+
+def move_bombs(game, moved, targets):
+    """
+        Moves bombs of a game in progress, updating the numbers of the opened
+        cells around them.
+    """
+    for index in moved:
+        game.cells[index] &= ~BOMB_BIT
+        game.add_to_bombs_near(index, -1)
+    for index in targets:
+        game.cells[index] |= BOMB_BIT
+        game.add_to_bombs_near(index, 1)
+    for index in moved:
+        for line, col in game.get_neighbours(*divmod(index, game.GRID_WIDTH)):
+            if game.is_opened(line, col):
+                game.set_status(line, col, STATUSES[
+                    game.compute_bombs_near(line, col) + 1])
+
+
+def create_no_guess_board(game_options, seed):
+    """
+        Creates a board the solver can win without guessing, with its start
+        square already opened. A random board, safe around a random start
+        square, is played by the solver. Each time the solver gets stuck, a
+        few bombs of the frontier are moved away so it can go on. Moving
+        bombs may invalidate earlier deductions, so a board the solver won is
+        played again from the start, and repaired further if it gets stuck.
+        A new board is drawn only when there is no room left to move bombs
+        to.
+
+        Parameters:
+        - game_options (GameOptions): The configuration of the board, for
+         which can_generate_no_guess must be true.
+        - seed (int): The seed of the board.
+    """
+    if not can_generate_no_guess(game_options):
+        raise ValueError('No guess boards need at least '
+                         f'{NO_GUESS_MIN_SIZE} lines and columns and '
+                         f'{NO_GUESS_FREE_CELLS} cells without bombs')
+    width, height = game_options.grid_width, game_options.grid_height
+    bombs_no = game_options.bombs_no
+    rng = random.Random(seed)
+    boards_no = repairs_no = 0
+    is_verified = False
+    while not is_verified:
+        boards_no += 1
+        line, col = rng.randrange(height), rng.randrange(width)
+        game = Minesweeper(width, height, bombs_no, seed=rng.getrandbits(63),
+                           first_click_safe=True)
+        revealed = game.open(line, col)
+        solver = Solver(game)
+        while True:
+            if play(game, solver, revealed):
+                bombs_pos = [index for index, cell in enumerate(game.cells)
+                             if cell & BOMB_BIT]
+                game = Minesweeper(width, height, bombs_no, seed=seed,
+                                   bombs_pos=bombs_pos)
+                revealed = game.open(line, col)
+                solver = Solver(game)
+                if play(game, solver):
+                    is_verified = True
+                    break
+            repair = find_repair(game, solver, rng)
+            if repair is None:
+                break
+            repairs_no += 1
+            moved, targets = repair
+            move_bombs(game, moved, targets)
+            if solver.constraints:
+                solver.remove_bombs(moved)
+            else:
+                # a bomb the solver found was moved
+                solver = Solver(game)
+            revealed = ()
+    LOGGER.debug('no guess board found after %d boards and %d repairs',
+                 boards_no, repairs_no)
+
+    game = Minesweeper(width, height, bombs_no, seed=seed,
+                       bombs_pos=bombs_pos)
+    game.open(line, col)
+    return game
+
+
+class BoardPool:
+    def __init__(self, game_options, generation, size=2, use_numpy=False):
+        """
+            Keeps a few boards generated in advance by a background thread,
+            so that a new game doesn't wait for its board. The generation
+            shares the GIL, apart from NumPy's, but the game loop sleeps
+            between events, which leaves the thread most of the time.
+
+            Parameters:
+            - game_options (GameOptions): The configuration of the boards.
+            - generation (Generation): How the bombs are placed.
+            - size (int, optional): The number of boards kept ready,
+             default 2.
+            - use_numpy (bool, optional): Generates random boards with NumPy,
+             default False.
+        """
+        self.game_options = game_options
+        self.generation = generation
+        self.use_numpy = use_numpy
+        self.boards = queue.Queue(maxsize=size)
+        self.stopped = None
+        self.thread = None
+        self.start()
+
+    def start(self):
+        """
+            Starts the thread filling the pool, if it is not running. The
+            boards kept while the pool was stopped are still used.
+        """
+        if self.stopped is not None and not self.stopped.is_set():
+            return
+        # each thread has its own event, so a thread still finishing its
+        # board after a stop exits even if the pool is started again
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.fill, args=(self.stopped,),
+                                       daemon=True)
+        self.thread.start()
+
+    def fill(self, stopped):
+        while not stopped.is_set():
+            board = create_board(self.game_options, random.getrandbits(63),
+                                 self.generation, self.use_numpy)
+            while not stopped.is_set():
+                try:
+                    self.boards.put(board, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+
+    def get(self):
+        """
+            Returns a board from the pool. If the pool is empty, waits for
+            the board the thread is generating, or generates one right away
+            if the pool is stopped.
+        """
+        while self.thread.is_alive():
+            try:
+                return self.boards.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        try:
+            return self.boards.get_nowait()
+        except queue.Empty:
+            return create_board(self.game_options, random.getrandbits(63),
+                                self.generation, self.use_numpy)
+
+    def stop(self, wait=False):
+        """
+            Stops the thread filling the pool, which keeps the boards it has
+            ready.
+
+            Parameters:
+            - wait (bool, optional): Waits for the thread to finish the board
+             it is generating, default False.
+        """
+        self.stopped.set()
+        if wait:
+            self.thread.join()
+
+
+def get_board_pool(game_options, generation):
+    """
+        Returns the pool of boards for the given options and generation mode,
+        starting it if needed. The pools of the last MAX_POOLS configurations
+        are kept, so that going back to the menu and starting a game with the
+        same options finds its board ready. The game handlers stop their pool
+        when their game loop ends, so only the pool of the running game
+        generates boards, but the stopped pools keep theirs: up to MAX_POOLS
+        times the pool size boards stay in memory, about 3 MB each at
+        1000x1000.
+    """
+    key = (game_options.grid_width, game_options.grid_height,
+           game_options.bombs_no, generation)
+    pool = POOLS.pop(key, None)
+    if pool is None:
+        pool = BoardPool(game_options, generation,
+                         use_numpy=numpy_backend is not None)
+    else:
+        pool.start()
+    POOLS[key] = pool
+    while len(POOLS) > MAX_POOLS:
+        _, oldest = POOLS.popitem(last=False)
+        oldest.stop()
+    return pool
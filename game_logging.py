@@ -0,0 +1,46 @@
+import functools
+import logging
+import os
+import time
+
+LOGGER = logging.getLogger('minesweeper')
+LOGGER.addHandler(logging.NullHandler())
+
+TRACE = os.environ.get('MINESWEEPER_TRACE') == '1'
+
+
+def configure():
+    """
+        Sends the game's log records to stderr, at the level named by the
+        MINESWEEPER_LOG_LEVEL environment variable. The default level is
+        DEBUG when tracing is enabled and WARNING otherwise.
+    """
+    default_level = 'DEBUG' if TRACE else 'WARNING'
+    level = os.environ.get('MINESWEEPER_LOG_LEVEL', default_level).upper()
+    logging.basicConfig(format='%(relativeCreated)d %(name)s %(message)s')
+    LOGGER.setLevel(level)
+
+
+def traced(method):
+    """
+        Logs every call of the decorated method along with its arguments and
+        duration, at debug level. When MINESWEEPER_TRACE is not set to 1 the
+        method is returned unchanged, so tracing costs nothing.
+
+        Parameters:
+        - method (function): The method to trace.
+    """
+    if not TRACE:
+        return method
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not LOGGER.isEnabledFor(logging.DEBUG):
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        result = method(self, *args, **kwargs)
+        LOGGER.debug('%s%s took %.3f ms', method.__qualname__, args,
+                     (time.perf_counter() - start) * 1000)
+        return result
+
+    return wrapper
@@ -1,16 +1,28 @@
+import os
+import time
+
 import pygame
 
+import snapshot
+from assets import IMAGE_CACHE
+from board_generation import get_board_pool, Generation
+from game_logging import LOGGER, traced
 from game_options import GameOptions
-from minesweeper import Minesweeper, CellStatus
-
-pygame.init()
-display_info = pygame.display.Info()
-WINDOW_WIDTH, WINDOW_HEIGHT = display_info.current_w, display_info.current_h
-
-print(WINDOW_WIDTH, WINDOW_HEIGHT)
-
-SQ_SIZE = WINDOW_HEIGHT / 33
-TOP_BAR_HEIGHT = 3 * SQ_SIZE
+from layout import Layout, RESET_BUTTON, MENU_BUTTON
+from minesweeper import CellStatus, STATUSES, STATUS_MASK
+from profiling import (FrameProfiler, PHASES, PERCENTILES, EVENTS, LOGIC,
+                       DRAW, DISPLAY)
+from replay import ReplayWriter, read_replay, OPEN, FLAG
+from solver import Solver
+
+STARTUP_TIMING = os.environ.get('MINESWEEPER_STARTUP_TIMING') == '1'
+REPLAY_DIR = os.environ.get('MINESWEEPER_REPLAY_DIR')
+SAVE_PATH = os.environ.get(
+    'MINESWEEPER_SAVE_PATH',
+    os.path.join(os.path.expanduser('~'), '.minesweeper_save'))
+PROFILE_TRACE = os.environ.get('MINESWEEPER_PROFILE_TRACE')
+
+WINDOW_WIDTH = WINDOW_HEIGHT = None
 
 IMG_PATHS = {
     CellStatus.UNKNOWN: 'resources/images/blank_cell.png',
@@ -28,35 +40,137 @@ IMG_PATHS = {
     CellStatus.FLAGGED: 'resources/images/flag.png',
 }
 
-IMAGES = {}
-
-for cell_status in CellStatus:
-    img = pygame.image.load(IMG_PATHS[cell_status])
-    scaled_img = pygame.transform.scale(img, (SQ_SIZE, SQ_SIZE))
-    IMAGES[cell_status] = scaled_img
-
-
-BTN_SIZE = 5/3 * SQ_SIZE
-CTR_PADDING = 1/3 * SQ_SIZE
-CTR_HEIGHT = 2 * SQ_SIZE
-CTR_WIDTH = 2 * SQ_SIZE
+CELL_IMAGES = {}
+CELL_ATLASES = {}
 
 HAPPY_PATH = 'resources/images/happy.png'
 DEAD_PATH = 'resources/images/dead.png'
 COOL_PATH = 'resources/images/cool.jpg'
 QUESTION_PATH = 'resources/images/question_face.png'
+FACE_PATHS = [HAPPY_PATH, DEAD_PATH, COOL_PATH, QUESTION_PATH]
 
 GRAY = (200, 200, 200)
+HINT_LEVELS = 10
+HINT_ALPHA = 110
+SCROLL_STEP = 3
+
+
+def init_display():
+    """
+        Initializes pygame and queries the size of the desktop, which the
+        layout of the game windows is computed from. Does nothing after the
+        first call, so importing this module stays cheap until a game is
+        started.
+    """
+    global WINDOW_WIDTH, WINDOW_HEIGHT
+    if WINDOW_HEIGHT is not None:
+        return
+
+    pygame.init()
+    # the desktop size, since the menu window may already be open
+    WINDOW_WIDTH, WINDOW_HEIGHT = pygame.display.get_desktop_sizes()[0]
+
+    LOGGER.info('desktop size %dx%d', WINDOW_WIDTH, WINDOW_HEIGHT)
+
+
+def load_cell_images(sq_size):
+    """
+        Returns the images of every cell status scaled to the given square
+        size, loading them only the first time a size is requested.
 
+        Parameters:
+        - sq_size (int): The size of each square in pixels.
+    """
+    images = CELL_IMAGES.get(sq_size)
+    if images is None:
+        images = {cell_status: IMAGE_CACHE.get(IMG_PATHS[cell_status],
+                                               (sq_size, sq_size))
+                  for cell_status in CellStatus}
+        CELL_IMAGES[sq_size] = images
+    return images
+
+
+def load_cell_atlas(sq_size):
+    """
+        Returns the images of every cell status scaled to the given square
+        size, packed side by side on one surface. The atlas is built only the
+        first time a size is requested.
+
+        Parameters:
+        - sq_size (int): The size of each square in pixels.
+
+        Returns:
+        - tuple: The atlas surface and the areas of the statuses on it,
+         indexed by status code, which is CellStatus.value + 1.
+    """
+    atlas = CELL_ATLASES.get(sq_size)
+    if atlas is None:
+        images = load_cell_images(sq_size)
+        width, height = images[CellStatus.UNKNOWN].get_size()
+        surface = pygame.Surface((width * len(STATUSES), height))
+        surface.fill(GRAY)
+        areas = [surface.blit(images[cell_status], (code * width, 0))
+                 for code, cell_status in enumerate(STATUSES)]
+        atlas = CELL_ATLASES[sq_size] = surface, areas
+    return atlas
+
+
+def load_saved_game():
+    """
+        Resumes the game saved at SAVE_PATH.
 
-def load_and_scale_image(image_path):
-    img = pygame.image.load(image_path)
-    return pygame.transform.scale(img, (BTN_SIZE, BTN_SIZE))
+        Returns:
+        - GameHandler: The handler of the saved game, None if there is no
+         saved game or it can't be read.
+    """
+    if not os.path.exists(SAVE_PATH):
+        return None
+    try:
+        game, info = snapshot.load(SAVE_PATH)
+    except OSError as error:
+        LOGGER.warning('could not load the saved game: %s', error)
+        return None
+    except ValueError as error:
+        # the save can never be resumed, so it is not offered again
+        LOGGER.warning('removing the unreadable saved game: %s', error)
+        os.remove(SAVE_PATH)
+        return None
+
+    game_options = GameOptions(game.GRID_WIDTH, game.GRID_HEIGHT,
+                               game.BOMBS_NO)
+    game_handler = GameHandler(game_options, info['time_limit'] is not None,
+                               info['time_limit'], info['generation'], game)
+    game_handler.timer.initial_time -= info['elapsed_ms']
+    return game_handler
+
+
+def find_replay(game):
+    """
+        Returns the path of the last replay of the board of a game in
+        MINESWEEPER_REPLAY_DIR, None if there is none.
+    """
+    if game.seed is None:
+        return None
+    suffix = f'-{game.seed}.msr'
+    # the names start with the time the replays were started
+    names = sorted(name for name in os.listdir(REPLAY_DIR)
+                   if name.endswith(suffix))
+    for name in reversed(names):
+        path = os.path.join(REPLAY_DIR, name)
+        try:
+            header, _ = read_replay(path)
+        except (IndexError, ValueError):
+            continue
+        if ((header['grid_width'], header['grid_height'], header['bombs_no'])
+                == (game.GRID_WIDTH, game.GRID_HEIGHT, game.BOMBS_NO)):
+            return path
+    return None
 
 
 class GameHandler:
     def __init__(self, game_options: GameOptions,
-                 is_timed=False, time_limit=None):
+                 is_timed=False, time_limit=None,
+                 generation=Generation.RANDOM, game=None):
         """
             The GameHandler class which contains the game grid as well as the
             elements in the top bar.
@@ -68,51 +182,243 @@ class GameHandler:
              default false
             - time_limit (int, optional): Time limit for the game,
              default None.
+            - generation (Generation, optional): How the bombs are placed,
+             default Generation.RANDOM. Boards are generated in advance by a
+             background thread.
+            - game (Minesweeper, optional): A game to resume instead of
+             starting a new one, default None.
         """
+        self.created_at = time.perf_counter()
+        init_display()
         self.is_timed = is_timed
+        self.time_limit = time_limit
         self.bombs_no = game_options.bombs_no
         self.grid_height = game_options.grid_height
         self.grid_width = game_options.grid_width
-        width = self.grid_width * SQ_SIZE
-
-        self.game = Minesweeper(self.grid_width, self.grid_height, SQ_SIZE,
-                                self.bombs_no, TOP_BAR_HEIGHT)
-        self.reset_button = Button(HAPPY_PATH, width // 2 - BTN_SIZE,
-                                   (TOP_BAR_HEIGHT - BTN_SIZE) // 2)
-        self.menu_button = Button(QUESTION_PATH, width // 2,
-                                  (TOP_BAR_HEIGHT - BTN_SIZE) // 2)
-        self.bombs_count = BombsCount(CTR_PADDING,
-                                      (TOP_BAR_HEIGHT - CTR_HEIGHT) // 2,
-                                      CTR_WIDTH, CTR_HEIGHT)
-        self.timer = Timer(width - CTR_PADDING - CTR_WIDTH,
-                           (TOP_BAR_HEIGHT - CTR_HEIGHT) // 2,
-                           CTR_WIDTH, CTR_HEIGHT,
-                           count_backwards=is_timed, time_limit=time_limit)
-
-        self.bombs_count.set_bombs_no(self.bombs_no)
-
-        screen_width = self.grid_width * SQ_SIZE
-        screen_height = self.grid_height * SQ_SIZE + TOP_BAR_HEIGHT
-
-        self.screen = pygame.display.set_mode([screen_width, screen_height])
-        self.draw_counters = width > 7 * SQ_SIZE
+        self.game_options = game_options
+        self.generation = generation
+        self.layout = Layout((WINDOW_WIDTH, WINDOW_HEIGHT), self.grid_width,
+                             self.grid_height, self.bombs_no)
+        self.viewport = self.layout.viewport
+        btn_size = self.layout.btn_size
+        IMAGE_CACHE.preload(FACE_PATHS, (btn_size, btn_size))
+
+        self.board_pool = get_board_pool(game_options, generation)
+        self.replay_writer = None
+        # the game the file at SAVE_PATH holds, if it is one of this handler
+        self.saved_game = game
+        if game is None:
+            game = self.create_game()
+        else:
+            self.start_replay(game, is_resumed=True)
+        self.game = game
+        self.reset_button = Button(HAPPY_PATH, *self.layout.reset_button)
+        self.menu_button = Button(QUESTION_PATH, *self.layout.menu_button)
+        self.bombs_count = BombsCount(*self.layout.bombs_count)
+        self.timer = Timer(*self.layout.timer, count_backwards=is_timed,
+                           time_limit=time_limit)
+
+        self.bombs_count.set_bombs_no(self.bombs_no - self.game.flags_no)
+        self.stats = StatsOverlay(*self.layout.stats)
+        self.show_stats = False
+        # always on when a trace is written, otherwise only with the HUD
+        self.profiler = FrameProfiler(enabled=PROFILE_TRACE is not None,
+                                      keep_trace=PROFILE_TRACE is not None)
+        self.profiler_hud = ProfilerHud(*self.layout.profiler_hud,
+                                        self.profiler)
+        self.show_profiler = False
+
+        self.screen = pygame.display.set_mode([self.layout.width,
+                                               self.layout.height])
+        self.canvas = pygame.Surface(self.screen.get_size())
+        self.cell_atlas = load_cell_atlas(self.viewport.sq_size)
+        self.needs_full_redraw = True
+        self.solver = None
+        self.show_hints = False
+        self.hint_surfaces = {}
+        self.draw_counters = self.layout.draw_counters
         self.return_to_menu = False
 
-    def draw(self):
+    def create_game(self):
+        """
+            Takes a ready board from the pool, and starts recording its replay
+            if MINESWEEPER_REPLAY_DIR is set.
         """
-            Draws the game elements on the screen
+        game = self.board_pool.get()
+        LOGGER.info('new game with seed %d', game.seed)
+        self.start_replay(game)
+        return game
+
+    def start_replay(self, game, is_resumed=False):
+        """
+            Starts recording the replay of a game if MINESWEEPER_REPLAY_DIR is
+            set, creating the directory if needed. A resumed game continues
+            the last replay of its board, since a new replay would miss the
+            moves played before it was saved. The game is not recorded, with
+            a warning, if its replay can't be written.
+
+            Parameters:
+            - game (Minesweeper): The game.
+            - is_resumed (bool, optional): Whether the game was resumed from
+             a save, default False.
         """
-        self.screen.fill(GRAY)
+        if self.replay_writer is not None:
+            self.replay_writer.close()
+            self.replay_writer = None
+        if REPLAY_DIR is None:
+            return
+        try:
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            if is_resumed:
+                path = find_replay(game)
+                if path is None:
+                    LOGGER.warning('no replay of the resumed game with seed '
+                                   '%s to continue', game.seed)
+                    return
+                self.replay_writer = ReplayWriter(path, game, self.generation,
+                                                  append=True)
+            else:
+                time_name = time.strftime('%Y%m%d-%H%M%S')
+                path = os.path.join(REPLAY_DIR, f'{time_name}-{game.seed}.msr')
+                self.replay_writer = ReplayWriter(path, game, self.generation)
+        except OSError as error:
+            LOGGER.warning('could not record the replay: %s', error)
 
-        for row in self.game.squares:
-            for square in row:
-                self.screen.blit(IMAGES[square.status], square.position)
+    @traced
+    def draw(self):
+        """
+            Draws the game elements that changed since the last frame on the
+            off-screen canvas and copies them on the screen. Only the cells
+            in the viewport are drawn, from the cell atlas, and a full
+            redraw submits them all in one blits call.
 
-        self.reset_button.draw(self.screen)
-        self.menu_button.draw(self.screen)
+            Returns:
+            - list: The rectangles of the screen that were redrawn.
+        """
+        viewport = self.viewport
+        atlas, areas = self.cell_atlas
+        cells = self.game.cells
+        if len(self.game.changed_cells) > viewport.cells_no:
+            self.needs_full_redraw = True
+
+        if self.needs_full_redraw:
+            self.game.changed_cells.clear()
+            self.canvas.fill(GRAY)
+            cols = viewport.get_visible_cols()
+            xs = [viewport.get_square_position(viewport.first_line, col)[0]
+                  for col in cols]
+            blits = []
+            for line in viewport.get_visible_lines():
+                _, y = viewport.get_square_position(line, viewport.first_col)
+                first = line * self.grid_width
+                blits += [(atlas, (x, y), areas[cells[first + col]
+                                                & STATUS_MASK])
+                          for col, x in zip(cols, xs)]
+            self.canvas.blits(blits, doreturn=False)
+            if (self.show_hints and not self.game.is_over
+                    and not self.game.is_won()):
+                self.draw_hints()
+            for widget in self.get_widgets():
+                widget.draw(self.canvas)
+            self.screen.blit(self.canvas, (0, 0))
+            self.needs_full_redraw = False
+            return [self.screen.get_rect()]
+
+        dirty_rects = []
+        for line, col in self.game.changed_cells:
+            if viewport.is_visible(line, col):
+                code = cells[line * self.grid_width + col] & STATUS_MASK
+                dirty_rects.append(self.canvas.blit(
+                    atlas, viewport.get_square_position(line, col),
+                    areas[code]))
+        self.game.changed_cells.clear()
+        # the profiler's HUD is drawn over the cells
+        if (self.show_profiler and dirty_rects
+                and self.profiler_hud.rect.collidelist(dirty_rects) != -1):
+            self.profiler_hud.is_dirty = True
+        for widget in self.get_widgets():
+            if widget.is_dirty:
+                dirty_rects.append(widget.draw(self.canvas))
+
+        for rect in dirty_rects:
+            self.screen.blit(self.canvas, rect, rect)
+        return dirty_rects
+
+    def draw_hints(self):
+        """
+            Tints every unknown cell in the viewport from green to red,
+            according to its probability of being a bomb.
+        """
+        if self.solver is None:
+            self.solver = Solver(self.game)
+        probabilities, interior_probability = (
+            self.solver.compute_probabilities())
+        for line in self.viewport.get_visible_lines():
+            for col in self.viewport.get_visible_cols():
+                if self.game.is_opened(line, col):
+                    continue
+                probability = probabilities.get((line, col),
+                                                interior_probability)
+                self.canvas.blit(self.get_hint_surface(probability),
+                                 self.viewport.get_square_position(line, col))
+
+    def get_hint_surface(self, probability):
+        """
+            Returns the translucent square drawn over a cell with the given
+            probability of being a bomb.
+        """
+        level = round(probability * HINT_LEVELS)
+        surface = self.hint_surfaces.get(level)
+        if surface is None:
+            size = self.viewport.sq_size
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            red = 255 * level // HINT_LEVELS
+            surface.fill((red, 255 - red, 0, HINT_ALPHA))
+            self.hint_surfaces[level] = surface
+        return surface
+
+    def scroll(self, lines, cols):
+        if self.viewport.scroll(lines, cols):
+            self.needs_full_redraw = True
+
+    def zoom(self, steps, mouse_x, mouse_y):
+        """
+            Zooms the viewport in, or out for negative steps, around the given
+            position of the screen.
+        """
+        if self.viewport.zoom_by(steps, mouse_x, mouse_y):
+            self.cell_atlas = load_cell_atlas(self.viewport.sq_size)
+            self.hint_surfaces = {}
+            self.needs_full_redraw = True
+
+    def toggle_stats(self):
+        self.show_stats = not self.show_stats
+        self.stats.reset()
+        self.needs_full_redraw = True
+
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        if PROFILE_TRACE is None:
+            self.profiler.toggle()
+        self.profiler_hud.reset()
+        self.needs_full_redraw = True
+
+    def toggle_hints(self):
+        self.show_hints = not self.show_hints
+        self.needs_full_redraw = True
+
+    def get_widgets(self):
+        """
+            Returns the elements of the top bar which are shown on the screen.
+        """
+        widgets = [self.reset_button, self.menu_button]
         if self.draw_counters:
-            self.bombs_count.draw(self.screen)
-            self.timer.draw(self.screen)
+            widgets += [self.bombs_count, self.timer]
+        if self.show_stats:
+            widgets.append(self.stats)
+        if self.show_profiler:
+            widgets.append(self.profiler_hud)
+        return widgets
 
     def process_left_click(self, mouse_x, mouse_y):
         """
@@ -122,18 +428,56 @@ class GameHandler:
             - mouse_x (int): The x-coordinate of the mouse click.
             - mouse_y (int): The y-coordinate of the mouse click.
         """
-        if (mouse_y > TOP_BAR_HEIGHT and not self.game.is_over
-                and not self.game.is_won()):
-            self.game.process_left_click(mouse_x, mouse_y)
-        elif self.reset_button.is_clicked(mouse_x, mouse_y):
+        target = self.layout.hit_test(mouse_x, mouse_y)
+        if isinstance(target, tuple):
+            if not self.game.is_over and not self.game.is_won():
+                self.open_square(*target)
+        elif target == RESET_BUTTON:
             self.timer.reset()
             self.bombs_count.set_bombs_no(self.bombs_no)
-            self.game = Minesweeper(self.grid_width, self.grid_height, SQ_SIZE,
-                                    self.bombs_no, TOP_BAR_HEIGHT)
-            self.reset_button.img = load_and_scale_image(HAPPY_PATH)
-        elif self.menu_button.is_clicked(mouse_x, mouse_y):
+            self.profiler.lap(EVENTS)
+            self.game = self.create_game()
+            self.profiler.lap(LOGIC)
+            self.solver = None
+            self.reset_button.set_image(HAPPY_PATH)
+            self.needs_full_redraw = True
+        elif target == MENU_BUTTON:
             self.return_to_menu = True
 
+    def process_middle_click(self, mouse_x, mouse_y):
+        """
+            Processes a middle-click event based on the mouse coordinates,
+            chording the clicked square if it is opened.
+
+            Parameters:
+            - mouse_x (int): The x-coordinate of the mouse click.
+            - mouse_y (int): The y-coordinate of the mouse click.
+        """
+        target = self.layout.hit_test(mouse_x, mouse_y)
+        if (isinstance(target, tuple) and not self.game.is_over
+                and not self.game.is_won() and self.game.is_opened(*target)):
+            self.open_square(*target)
+
+    def open_square(self, line, col):
+        """
+            Opens a square, or chords it if it is already opened, and updates
+            everything that follows the game with the opened cells.
+
+            Parameters:
+            - line (int): The line the square is on.
+            - col (int): The column the square is on.
+        """
+        self.profiler.lap(EVENTS)
+        revealed = self.game.open(line, col)
+        if self.replay_writer is not None:
+            self.replay_writer.record(OPEN, line, col)
+        if self.solver is not None:
+            self.solver.update(revealed)
+        self.profiler.lap(LOGIC)
+        if self.show_hints and revealed:
+            self.needs_full_redraw = True
+        self.bombs_count.set_bombs_no(self.bombs_no - self.game.flags_no)
+
     def process_right_click(self, mouse_x, mouse_y):
         """
             Processes a right-click event based on the mouse coordinates.
@@ -142,69 +486,252 @@ class GameHandler:
             - mouse_x (int): The x-coordinate of the mouse click.
             - mouse_y (int): The y-coordinate of the mouse click.
         """
-        if (mouse_y > TOP_BAR_HEIGHT and not self.game.is_over
+        target = self.layout.hit_test(mouse_x, mouse_y)
+        if (isinstance(target, tuple) and not self.game.is_over
                 and not self.game.is_won()):
-            self.game.process_right_click(mouse_x, mouse_y)
+            line, col = target
+            self.profiler.lap(EVENTS)
+            self.game.flag(line, col)
+            self.profiler.lap(LOGIC)
+            if self.replay_writer is not None:
+                self.replay_writer.record(FLAG, line, col)
+            if self.show_hints:
+                self.needs_full_redraw = True
             self.bombs_count.set_bombs_no(self.bombs_no - self.game.flags_no)
 
+    def process_key(self, key):
+        """
+            Processes a key press: H toggles the hints, F the stats overlay,
+            P the profiler's HUD, the arrow keys scroll the viewport and + and
+            - zoom it.
+        """
+        if key == pygame.K_h:
+            self.toggle_hints()
+        elif key == pygame.K_f:
+            self.toggle_stats()
+        elif key == pygame.K_p:
+            self.toggle_profiler()
+        elif key == pygame.K_UP:
+            self.scroll(-1, 0)
+        elif key == pygame.K_DOWN:
+            self.scroll(1, 0)
+        elif key == pygame.K_LEFT:
+            self.scroll(0, -1)
+        elif key == pygame.K_RIGHT:
+            self.scroll(0, 1)
+        elif key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            self.zoom(1, self.viewport.width / 2,
+                      self.viewport.top + self.viewport.height / 2)
+        elif key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.zoom(-1, self.viewport.width / 2,
+                      self.viewport.top + self.viewport.height / 2)
+
+    def process_wheel(self, wheel_x, wheel_y):
+        """
+            Processes a mouse wheel event: the wheel scrolls the viewport,
+            horizontally while shift is held, and zooms it around the mouse
+            while ctrl is held.
+        """
+        mods = pygame.key.get_mods()
+        if mods & pygame.KMOD_CTRL:
+            self.zoom(wheel_y, *pygame.mouse.get_pos())
+        elif mods & pygame.KMOD_SHIFT:
+            self.scroll(0, -wheel_y * SCROLL_STEP)
+        else:
+            self.scroll(-wheel_y * SCROLL_STEP, wheel_x * SCROLL_STEP)
+
     def game_loop(self):
         """
-            The main game loop.
+            The main game loop. It draws a frame, then sleeps until an event
+            arrives or until the timer or an overlay has to change. The
+            profiler times each frame from the end of the sleep.
         """
-        clock = pygame.time.Clock()
+        is_first_frame = True
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        profiler = self.profiler
+        profiler.start_frame()
 
         while not self.return_to_menu:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    quit()
-                if event.type == pygame.MOUSEBUTTONUP:
-                    if event.button == 1:
-                        self.process_left_click(event.pos[0], event.pos[1])
-                    if event.button == 3:
-                        self.process_right_click(event.pos[0], event.pos[1])
-
-            if self.is_timed and self.timer.time == 0:
-                self.game.is_over = True
-                self.game.reveal_bombs()
-
+            self.update_timer()
             if self.game.is_over:
-                self.reset_button.img = load_and_scale_image(DEAD_PATH)
+                self.reset_button.set_image(DEAD_PATH)
             elif self.game.is_won():
-                self.reset_button.img = load_and_scale_image(COOL_PATH)
-            else:
-                self.timer.update()
-
-            self.draw()
+                self.reset_button.set_image(COOL_PATH)
+            profiler.lap(LOGIC)
+
+            if self.show_stats:
+                self.stats.count_frame()
+            if self.show_profiler:
+                self.profiler_hud.update()
+            dirty_rects = self.draw()
+            profiler.lap(DRAW)
+            pygame.display.update(dirty_rects)
+            profiler.lap(DISPLAY)
+            profiler.end_frame()
+            if is_first_frame:
+                is_first_frame = False
+                if STARTUP_TIMING:
+                    latency = time.perf_counter() - self.created_at
+                    print(f'first frame after {latency * 1000:.1f} ms')
+
+            events = self.wait_for_events()
+            profiler.start_frame()
+            # the time may have run out while waiting, before these events
+            self.update_timer()
+            for event in events:
+                self.process_event(event)
+            profiler.lap(EVENTS)
+
+        pygame.event.set_allowed(pygame.MOUSEMOTION)
+        self.close()
+
+    def close(self):
+        """
+            Ends the session, when returning to the menu or quitting: stops
+            the board pool, writes the profiler's trace if
+            MINESWEEPER_PROFILE_TRACE is set, saves the game and closes its
+            replay.
+        """
+        self.board_pool.stop()
+        if PROFILE_TRACE is not None:
+            self.profiler.dump_trace(PROFILE_TRACE)
+        self.save_game()
+        if self.replay_writer is not None:
+            self.replay_writer.close()
+            self.replay_writer = None
+
+    def update_timer(self):
+        """
+            Updates the timer of a game in progress, and ends a timed game as
+            soon as its time is up.
+        """
+        if self.game.is_over or self.game.is_won():
+            return
+        self.timer.update()
+        if self.is_timed and self.timer.time == 0:
+            self.game.is_over = True
+            self.game.reveal_bombs()
+
+    def save_game(self):
+        """
+            Saves the game at SAVE_PATH if it is in progress, so that it can
+            be resumed from the menu. Removes the saved game once it is over,
+            if it is this game. An untouched game leaves the save alone.
+        """
+        if self.game.opened_no == self.game.flags_no == 0:
+            return
+        if self.game.is_over or self.game.is_won():
+            if self.game is self.saved_game and os.path.exists(SAVE_PATH):
+                os.remove(SAVE_PATH)
+            return
+        elapsed_ms = pygame.time.get_ticks() - self.timer.initial_time
+        snapshot.save(SAVE_PATH, self.game, self.generation, elapsed_ms,
+                      self.time_limit if self.is_timed else None)
+        self.saved_game = self.game
+
+    def wait_for_events(self):
+        """
+            Blocks until there are events to process, or until the timer
+            changes or until the next update of an overlay.
 
-            pygame.display.flip()
-            clock.tick(60)
+            Returns:
+            - list: The pending events, empty if the wait timed out.
+        """
+        timeouts = []
+        if not self.game.is_over and not self.game.is_won():
+            timeouts.append(self.timer.get_ms_to_next_change())
+        if self.show_stats:
+            timeouts.append(self.stats.get_ms_to_update())
+        if self.show_profiler:
+            timeouts.append(self.profiler_hud.get_ms_to_update())
+
+        if timeouts:
+            first_event = pygame.event.wait(max(min(timeouts), 1))
+        else:
+            first_event = pygame.event.wait()
+        events = pygame.event.get()
+        if first_event.type != pygame.NOEVENT:
+            events.insert(0, first_event)
+        return events
+
+    def process_event(self, event):
+        if event.type == pygame.QUIT:
+            self.close()
+            quit()
+        if event.type == pygame.WINDOWEXPOSED:
+            self.needs_full_redraw = True
+        if event.type == pygame.KEYDOWN:
+            self.process_key(event.key)
+        if event.type == pygame.MOUSEWHEEL:
+            self.process_wheel(event.x, event.y)
+        if event.type == pygame.MOUSEBUTTONUP:
+            if event.button == 1:
+                self.process_left_click(event.pos[0], event.pos[1])
+            if event.button == 2:
+                self.process_middle_click(event.pos[0], event.pos[1])
+            if event.button == 3:
+                self.process_right_click(event.pos[0], event.pos[1])
 
 
 class Button:
-    def __init__(self, img_path, x, y):
+    def __init__(self, img_path, x, y, width, height):
         """
-            Initializes a Button instance with an image and position.
+            Initializes a Button instance with an image, a dimension and a
+            position.
 
             Parameters:
             - img_path (str): The file path of the image for the button.
             - x (int): The x-coordinate of the button's top-left corner.
             - y (int): The y-coordinate of the button's top-left corner.
+            - width (int): The width of the button.
+            - height (int): The height of the button.
         """
-        self.rect = pygame.Rect(x, y, BTN_SIZE, BTN_SIZE)
-        self.img = load_and_scale_image(img_path)
+        self.rect = pygame.Rect(x, y, width, height)
+        self.img = IMAGE_CACHE.get(img_path, self.rect.size)
+        self.is_dirty = True
 
-    def draw(self, screen):
-        screen.blit(self.img, self.rect)
+    def set_image(self, img_path):
+        img = IMAGE_CACHE.get(img_path, self.rect.size)
+        if img is not self.img:
+            self.img = img
+            self.is_dirty = True
 
-    def is_clicked(self, mouse_x, mouse_y):
-        if self.rect.collidepoint(mouse_x, mouse_y):
-            return True
+    def draw(self, screen):
+        self.is_dirty = False
+        return screen.blit(self.img, self.rect)
 
 
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 default_font = pygame.font.get_default_font()
 
+COUNTER_FONT_SIZE = 28
+GLYPHS = '0123456789-'
+GLYPH_ATLASES = {}
+
+
+def load_glyph_atlas(font_size):
+    """
+        Renders the digits and the minus sign side by side on one surface,
+        once per font size.
+
+        Returns:
+        - tuple: The atlas surface and a dict mapping each glyph to its area
+         of the atlas.
+    """
+    if font_size not in GLYPH_ATLASES:
+        font = pygame.font.Font(default_font, font_size)
+        rendered = [font.render(glyph, True, WHITE) for glyph in GLYPHS]
+        atlas = pygame.Surface((sum(glyph.get_width() for glyph in rendered),
+                                max(glyph.get_height() for glyph in rendered)))
+        areas = {}
+        x = 0
+        for glyph, surface in zip(GLYPHS, rendered):
+            areas[glyph] = atlas.blit(surface, (x, 0))
+            x += surface.get_width()
+        GLYPH_ATLASES[font_size] = atlas, areas
+    return GLYPH_ATLASES[font_size]
+
 
 class Counter:
     def __init__(self, x, y, width, height):
@@ -218,11 +745,35 @@ class Counter:
             - height (int): The height of the counter.
         """
         self.rect = pygame.Rect(x, y, width, height)
-        self.font = pygame.font.Font(default_font, 28)
+        self.atlas, self.glyph_areas = load_glyph_atlas(COUNTER_FONT_SIZE)
         self.surface = pygame.Surface((width, height))
+        self.displayed_value = None
+        self.is_dirty = True
+
+    def set_value(self, value):
+        """
+            Composes the value from the cached glyphs, centered on the
+            counter. Does nothing if the value is already displayed.
+        """
+        if value == self.displayed_value:
+            return
+        self.displayed_value = value
+        areas = [self.glyph_areas[glyph] for glyph in str(value)]
+        width = sum(area.width for area in areas)
+        height = max(area.height for area in areas)
+        x = (self.rect.width - width) // 2
+        y = (self.rect.height - height) // 2
+        blits = []
+        for area in areas:
+            blits.append((self.atlas, (x, y), area))
+            x += area.width
+        self.surface.fill(BLACK)
+        self.surface.blits(blits, doreturn=False)
+        self.is_dirty = True
 
     def draw(self, screen):
-        screen.blit(self.surface, self.rect)
+        self.is_dirty = False
+        return screen.blit(self.surface, self.rect)
 
 
 class BombsCount(Counter):
@@ -239,10 +790,7 @@ class BombsCount(Counter):
         super().__init__(x, y, width, height)
 
     def set_bombs_no(self, bombs_no):
-        self.surface.fill(BLACK)
-        bombs_count = self.font.render(str(bombs_no), True, WHITE)
-        rect = bombs_count.get_rect(center=self.surface.get_rect().center)
-        self.surface.blit(bombs_count, rect)
+        self.set_value(bombs_no)
 
 
 class Timer(Counter):
@@ -266,6 +814,7 @@ class Timer(Counter):
         super().__init__(x, y, width, height)
         self.initial_time = pygame.time.get_ticks()
         self.time_limit = time_limit + 1 if time_limit is not None else None
+        self.counts_backwards = count_backwards
 
         if count_backwards:
             self.get_current_time = self.count_backwards
@@ -274,11 +823,8 @@ class Timer(Counter):
         self.time = self.get_current_time()
 
     def update(self):
-        self.surface.fill(BLACK)
         self.time = self.get_current_time()
-        timer_text = self.font.render(str(self.time), True, WHITE)
-        rect = timer_text.get_rect(center=self.surface.get_rect().center)
-        self.surface.blit(timer_text, rect)
+        self.set_value(self.time)
 
     def count_forward(self):
         time = (pygame.time.get_ticks() - self.initial_time) // 1000
@@ -296,3 +842,127 @@ class Timer(Counter):
     def reset(self):
         self.initial_time = pygame.time.get_ticks()
         self.time = self.get_current_time()
+
+    def get_ms_to_next_change(self):
+        """
+            Returns the milliseconds until the displayed time changes. Counting
+            forward it changes on every whole second, counting backwards 1 ms
+            after, since the remaining seconds are rounded up.
+        """
+        elapsed = pygame.time.get_ticks() - self.initial_time
+        if self.counts_backwards:
+            elapsed -= 1
+        return 1000 - elapsed % 1000
+
+
+class StatsOverlay:
+    def __init__(self, x, y, width, height):
+        """
+            A line of text in the top bar showing how many frames were drawn
+            and how much CPU time the process used in the last second.
+
+            Parameters:
+            - x (int): The x-coordinate of the overlay's top-left corner.
+            - y (int): The y-coordinate of the overlay's top-left corner.
+            - width (int): The width of the overlay.
+            - height (int): The height of the overlay.
+        """
+        self.rect = pygame.Rect(x, y, width, height)
+        self.font = pygame.font.Font(default_font, max(int(height), 8))
+        self.surface = pygame.Surface((width, height))
+        self.is_dirty = True
+        self.reset()
+
+    def reset(self):
+        self.frames_no = 0
+        self.last_update = time.perf_counter()
+        self.last_cpu_time = time.process_time()
+        self.render('measuring...')
+
+    def count_frame(self):
+        """
+            Counts a drawn frame, and refreshes the text once a second has
+            passed since the last refresh.
+        """
+        self.frames_no += 1
+        now = time.perf_counter()
+        elapsed = now - self.last_update
+        if elapsed < 1:
+            return
+        cpu_time = time.process_time()
+        cpu_usage = (cpu_time - self.last_cpu_time) / elapsed * 100
+        self.render(f'{self.frames_no / elapsed:.1f} fps  '
+                    f'{cpu_usage:.1f}% cpu')
+        self.frames_no = 0
+        self.last_update = now
+        self.last_cpu_time = cpu_time
+
+    def get_ms_to_update(self):
+        elapsed = time.perf_counter() - self.last_update
+        return max(int((1 - elapsed) * 1000), 0)
+
+    def render(self, text):
+        self.surface.fill(GRAY)
+        self.surface.blit(self.font.render(text, True, BLACK), (2, 0))
+        self.is_dirty = True
+
+    def draw(self, screen):
+        self.is_dirty = False
+        return screen.blit(self.surface, self.rect)
+
+
+class ProfilerHud:
+    def __init__(self, x, y, width, height, profiler):
+        """
+            A table over the grid showing the rolling percentiles of the
+            durations of the phases of the frames, refreshed every second.
+
+            Parameters:
+            - x (int): The x-coordinate of the HUD's top-left corner.
+            - y (int): The y-coordinate of the HUD's top-left corner.
+            - width (int): The width of the HUD.
+            - height (int): The height of the HUD.
+            - profiler (FrameProfiler): The profiler timing the frames.
+        """
+        self.rect = pygame.Rect(x, y, width, height)
+        self.line_height = height // (len(PHASES) + 2)
+        self.font = pygame.font.Font(default_font,
+                                     max(self.line_height, 8))
+        self.surface = pygame.Surface((width, height))
+        self.profiler = profiler
+        self.is_dirty = True
+        self.reset()
+
+    def reset(self):
+        self.last_update = time.perf_counter()
+        self.render()
+
+    def update(self):
+        if time.perf_counter() - self.last_update >= 1:
+            self.reset()
+
+    def get_ms_to_update(self):
+        elapsed = time.perf_counter() - self.last_update
+        return max(int((1 - elapsed) * 1000), 0)
+
+    def render(self):
+        percentiles = self.profiler.get_percentiles()
+        rows = [('ms', [f'p{percentile}' for percentile in PERCENTILES])]
+        for phase in (*PHASES, 'total'):
+            rows.append((phase, [f'{seconds * 1000:.2f}'
+                                 for seconds in percentiles.get(phase, [])]))
+
+        self.surface.fill(GRAY)
+        col_width = self.rect.width // (len(PERCENTILES) + 1)
+        for index, (name, cells) in enumerate(rows):
+            y = index * self.line_height
+            self.surface.blit(self.font.render(name, True, BLACK), (2, y))
+            for col, text in enumerate(cells, 2):
+                rendered = self.font.render(text, True, BLACK)
+                self.surface.blit(rendered, (col * col_width
+                                             - rendered.get_width() - 4, y))
+        self.is_dirty = True
+
+    def draw(self, screen):
+        self.is_dirty = False
+        return screen.blit(self.surface, self.rect)
@@ -0,0 +1,103 @@
+import pygame
+
+from viewport import Viewport
+
+# the window is 33 squares high: 3 for the top bar and up to 30 for the grid
+WINDOW_SQUARES = 33
+TOP_BAR_SQUARES = 3
+VISIBLE_LINES = WINDOW_SQUARES - TOP_BAR_SQUARES
+
+PROFILER_HUD_LINES = 6
+
+RESET_BUTTON = 'reset'
+MENU_BUTTON = 'menu'
+BUTTONS = (RESET_BUTTON, MENU_BUTTON)
+
+
+class Layout:
+    def __init__(self, desktop_size, grid_width, grid_height, bombs_no):
+        """
+            The geometry of a game window, computed once when the window is
+            created. Every size and position is a whole number of pixels, so
+            squares and widgets are drawn pixel-exact and never overlap.
+
+            Parameters:
+            - desktop_size (tuple): The width and height of the desktop.
+            - grid_width (int): The width of the game grid.
+            - grid_height (int): The height of the game grid.
+            - bombs_no (int): The number of bombs, which sets the width of
+             the bombs counter.
+
+            Attributes:
+            - sq_size (int): The size of a square at the default zoom.
+            - width (int): The width of the window.
+            - height (int): The height of the window.
+            - top_bar_height (int): The height of the top bar.
+            - btn_size (int): The size of the buttons.
+            - viewport (Viewport): The part of the grid shown in the window.
+            - reset_button, menu_button, bombs_count, timer, stats
+             (pygame.Rect): The areas of the elements of the top bar.
+            - profiler_hud (pygame.Rect): The area of the profiler's HUD, at
+             the top left of the grid.
+            - draw_counters (bool): Whether the window is wide enough for the
+             counters.
+        """
+        desktop_width, desktop_height = desktop_size
+        sq_size = max(desktop_height // WINDOW_SQUARES, 1)
+        self.sq_size = sq_size
+        self.top_bar_height = TOP_BAR_SQUARES * sq_size
+        self.btn_size = 5 * sq_size // 3
+        ctr_padding = sq_size // 3
+        ctr_height = 2 * sq_size
+        ctr_width = 2 * sq_size
+
+        # the window shows as much of the grid as fits on the desktop
+        cols_no = min(grid_width, max(desktop_width // sq_size, 1))
+        self.width = cols_no * sq_size
+        grid_area_height = min(grid_height, VISIBLE_LINES) * sq_size
+        self.height = self.top_bar_height + grid_area_height
+        self.viewport = Viewport(grid_width, grid_height, self.width,
+                                 grid_area_height, self.top_bar_height,
+                                 sq_size)
+
+        btn_top = (self.top_bar_height - self.btn_size) // 2
+        self.reset_button = pygame.Rect(self.width // 2 - self.btn_size,
+                                        btn_top, self.btn_size, self.btn_size)
+        self.menu_button = pygame.Rect(self.width // 2, btn_top,
+                                       self.btn_size, self.btn_size)
+
+        ctr_top = (self.top_bar_height - ctr_height) // 2
+        # wide enough for the bombs of large boards, about 3 digits per
+        # ctr_height
+        bombs_width = max(ctr_width,
+                          len(str(bombs_no)) * ctr_height // 3 + ctr_padding)
+        self.bombs_count = pygame.Rect(ctr_padding, ctr_top, bombs_width,
+                                       ctr_height)
+        self.timer = pygame.Rect(self.width - ctr_padding - ctr_width,
+                                 ctr_top, ctr_width, ctr_height)
+        self.stats = pygame.Rect(0, 0, self.width, ctr_padding * 3 // 2)
+        self.profiler_hud = pygame.Rect(
+            0, self.top_bar_height, min(self.width, 9 * sq_size),
+            min(grid_area_height, PROFILER_HUD_LINES * (2 * sq_size // 3)))
+        self.draw_counters = self.width > 7 * sq_size
+
+    def hit_test(self, x, y):
+        """
+            Finds what is at a position of the window in constant time.
+
+            Parameters:
+            - x (int): The x-coordinate of the position.
+            - y (int): The y-coordinate of the position.
+
+            Returns:
+            - tuple or str: The (line, column) of a square, RESET_BUTTON or
+             MENU_BUTTON, or None for anything else.
+        """
+        if y >= self.top_bar_height:
+            return self.viewport.get_square_at(x, y)
+        if (not self.reset_button.top <= y < self.reset_button.bottom
+                or x < self.reset_button.left):
+            return None
+        # the buttons are side by side
+        index = (x - self.reset_button.left) // self.btn_size
+        return BUTTONS[index] if index < len(BUTTONS) else None
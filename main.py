@@ -1,5 +1,13 @@
+import time
+
+start = time.perf_counter()
+import game_logging
+import gamehandler
 from start_menu import menu_loop
+import_time = time.perf_counter() - start
 
 if __name__ == '__main__':
+    game_logging.configure()
+    if gamehandler.STARTUP_TIMING:
+        print(f'imports done in {import_time * 1000:.1f} ms')
     menu_loop()
-
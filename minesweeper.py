@@ -1,6 +1,15 @@
+import logging
 import random
+import re
 from enum import Enum
 
+from game_logging import LOGGER, traced
+
+try:
+    import numpy_backend
+except ImportError:
+    numpy_backend = None
+
 
 class CellStatus(Enum):
     UNKNOWN = -1
@@ -29,154 +38,420 @@ class Direction(Enum):
     UP_LEFT = (-1, -1)
 
 
+NEIGHBOURS = [dir.value for dir in Direction]
+
+# each cell is packed in a byte: the low 4 bits hold its status code, which is
+# CellStatus.value + 1, and the two bits above mark opened cells and bombs
+STATUS_MASK = 0x0F
+OPENED_BIT = 0x10
+BOMB_BIT = 0x20
+STATUSES = sorted(CellStatus, key=lambda cell_status: cell_status.value)
+
+
+def is_hidden_bomb(cell):
+    """
+        Tells if a packed cell is a bomb which is neither opened nor shown.
+    """
+    return bool(cell & BOMB_BIT and not cell & OPENED_BIT
+                and cell & STATUS_MASK != CellStatus.BOMB.value + 1)
+
+
+# maps each packed cell to itself, or to the bomb status for hidden bombs
+REVEALED_CELLS = bytes(cell & ~STATUS_MASK | CellStatus.BOMB.value + 1
+                       if is_hidden_bomb(cell) else cell
+                       for cell in range(256))
+# maps the hidden bombs to 1 and every other cell to 0
+HIDDEN_BOMBS = bytes(int(is_hidden_bomb(cell)) for cell in range(256))
+
+
 class Square:
-    def __init__(self, position, status: CellStatus, is_bomb):
-        self.position = position
-        self.status = status
-        self.is_bomb = is_bomb
-        self.is_opened = False
+    __slots__ = ('game', 'line', 'col')
+
+    def __init__(self, game, line, col):
+        """
+            A read-only view of a cell of a Minesweeper game. The cell can
+            only be changed through the game, so that its counters and
+            changed_cells stay up to date.
+
+            Parameters:
+            - game (Minesweeper): The game.
+            - line (int): The line the cell is on.
+            - col (int): The column the cell is on.
+        """
+        self.game = game
+        self.line = line
+        self.col = col
+
+    @property
+    def status(self):
+        return self.game.get_status(self.line, self.col)
+
+    @property
+    def is_bomb(self):
+        return self.game.is_bomb(self.line, self.col)
+
+    @property
+    def is_opened(self):
+        return self.game.is_opened(self.line, self.col)
 
     def toggle_flag(self):
-        if self.status == CellStatus.UNKNOWN:
-            self.status = CellStatus.FLAGGED
-        elif self.status == CellStatus.FLAGGED:
-            self.status = CellStatus.UNKNOWN
+        self.game.flag(self.line, self.col)
 
 
 class Minesweeper:
-    def __init__(self, grid_width, grid_height, sq_size, bombs_no,
-                 top_bar_height):
+    @traced
+    def __init__(self, grid_width, grid_height, bombs_no, seed=None,
+                 use_numpy=False, first_click_safe=False, bombs_pos=None,
+                 bombs_near=None):
         """
-        The Minesweeper game
+        The Minesweeper game. It only deals with (line, column) positions on
+        the grid, so it can be used without a window.
 
         Parameters:
         - grid_width (int): The width of the game grid.
         - grid_height (int): The height of the game grid.
-        - sq_size (int): The size of each square in pixels.
         - bombs_no (int): The number of bombs in the game.
-        - top_bar_height (int): The height of the top bar of the game window.
+        - seed (int, optional): The seed the bombs are placed with, default
+         None for a random board.
+        - use_numpy (bool, optional): Places the bombs and counts their
+         neighbours with NumPy, default False. The same seed gives different
+         boards with and without NumPy.
+        - first_click_safe (bool, optional): Moves the bombs around the first
+         square opened to random free cells, default False. The bombs are
+         still placed right away, so that boards can be generated in
+         advance and the first click only patches them.
+        - bombs_pos (list, optional): The indexes of the bombs, when they are
+         chosen by the caller, default None.
+        - bombs_near (bytearray, optional): The neighbour counts of bombs_pos,
+         computed from it when None, default None.
 
         Attributes:
         - BOMBS_NO (int): The number of bombs in the game.
-        - SQ_SIZE (int): The size of each square in pixels.
         - GRID_HEIGHT (int): The height of the game grid.
         - GRID_WIDTH (int): The width of the game grid.
-        - bombs (list): A matrix representing bomb locations in the game grid.
-        - squares (list): A matrix representing the squares in the game grid.
+        - seed (int): The seed the bombs were placed with, None if random.
+        - cells (bytearray): The packed state of every cell, indexed by
+         line * GRID_WIDTH + column.
+        - bombs_near (bytearray): The number of bombs adjacent to each cell,
+         with the same indexes as cells, None until the bombs are placed.
+        - are_bombs_placed (bool): Indicates if the bombs have been placed.
+        - first_click_safe (bool): Whether the bombs are still to be moved
+         away from the first square opened.
         - is_over (bool): Indicates if the game is over.
         - flags_no (int): The number of flags placed on the grid.
+        - opened_no (int): The number of safe cells opened so far.
+        - changed_cells (list): The (line, column) positions of the squares
+         whose status changed since the list was last cleared by the
+         renderer.
         """
         self.BOMBS_NO = bombs_no
-        self.SQ_SIZE = sq_size
         self.GRID_HEIGHT = grid_height
         self.GRID_WIDTH = grid_width
-        self.top_bar_height = top_bar_height
-        self.bombs = self.generate_bombs()
-        self.squares = [
-            [Square((j * self.SQ_SIZE,
-                     i * self.SQ_SIZE + self.top_bar_height),
-                    CellStatus.UNKNOWN, self.bombs[i][j])
-             for j in range(grid_width)]
-            for i in range(grid_height)
-        ]
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.cells = bytearray([CellStatus.UNKNOWN.value + 1]
+                               * (grid_width * grid_height))
+        self.bombs_near = None
+        self.are_bombs_placed = False
+
+        if use_numpy and numpy_backend is None:
+            raise ImportError('NumPy is required to use_numpy')
+        self.use_numpy = use_numpy
+
+        if bombs_pos is not None:
+            self.place_bombs(bombs_pos, bombs_near)
+        elif use_numpy:
+            self.place_numpy_bombs()
+        else:
+            self.place_bombs(self.generate_bombs())
+        self.first_click_safe = first_click_safe
         self.is_over = False
         self.flags_no = 0
+        self.opened_no = 0
+        self.changed_cells = []
 
-    def generate_bombs(self):
+    @property
+    def squares(self):
         """
-            Generates bomb positions within the game grid.
+            A matrix of Square views over the cells. It is built on every
+            access, so get_status and the other cell accessors should be
+            preferred.
+        """
+        return [[Square(self, i, j) for j in range(self.GRID_WIDTH)]
+                for i in range(self.GRID_HEIGHT)]
 
-            Returns:
-            - a matrix representing bomb positions in the game grid,
+    def get_status(self, line, col):
+        return STATUSES[self.cells[line * self.GRID_WIDTH + col] & STATUS_MASK]
+
+    def is_bomb(self, line, col):
+        return bool(self.cells[line * self.GRID_WIDTH + col] & BOMB_BIT)
+
+    def is_opened(self, line, col):
+        return bool(self.cells[line * self.GRID_WIDTH + col] & OPENED_BIT)
+
+    def set_status(self, line, col, status):
         """
-        bombs_pos = random.sample(
-            [(i, j) for i in range(self.GRID_HEIGHT)
-             for j in range(self.GRID_WIDTH)],
-            self.BOMBS_NO
-        )
-        bombs = [[False for _ in range(self.GRID_WIDTH)]
-                 for _ in range(self.GRID_HEIGHT)]
-        for pos in bombs_pos:
-            bombs[pos[0]][pos[1]] = True
+            Changes the status of the square at the given position, recording
+            it in changed_cells if it is different.
 
-        for i in range(self.GRID_HEIGHT):
-            for j in range(self.GRID_WIDTH):
-                if bombs[i][j]:
-                    print("X", end="   ")
-                else:
-                    print("0", end="   ")
-            print()
+            Parameters:
+            - line (int): The line the square is on.
+            - col (int): The column the square is on.
+            - status (CellStatus): The new status of the square.
+        """
+        index = line * self.GRID_WIDTH + col
+        cell = self.cells[index]
+        if cell & STATUS_MASK != status.value + 1:
+            self.cells[index] = (cell & ~STATUS_MASK) | (status.value + 1)
+            self.changed_cells.append((line, col))
 
-        return bombs
+    def place_bombs(self, bombs_pos, bombs_near=None):
+        """
+            Places the bombs on the grid.
 
-    def process_left_click(self, mouse_x, mouse_y):
+            Parameters:
+            - bombs_pos (list): The indexes of the bombs.
+            - bombs_near (bytearray, optional): The neighbour counts, computed
+             from bombs_pos when None, default None.
+        """
+        for index in bombs_pos:
+            self.cells[index] |= BOMB_BIT
+        if bombs_near is None:
+            bombs_near = self.compute_neighbour_counts(bombs_pos)
+        self.bombs_near = bombs_near
+        self.are_bombs_placed = True
+
+    def place_numpy_bombs(self):
+        """
+            Places the bombs and counts their neighbours with NumPy.
         """
-            Processes a left-click event on the game grid based on the mouse
-            coordinates.
+        bombs = numpy_backend.generate_bombs(self.GRID_WIDTH,
+                                             self.GRID_HEIGHT, self.BOMBS_NO,
+                                             self.seed)
+        self.place_bombs(
+            bombs.ravel().nonzero()[0].tolist(),
+            bytearray(numpy_backend.compute_neighbour_counts(bombs)
+                      .tobytes()))
+
+    def get_safe_area(self, line, col):
+        """
+            Returns the indexes of the cells kept free of bombs around a first
+            click: the square and its neighbours, or only the square when
+            there are too many bombs for that.
+        """
+        area = [new_line * self.GRID_WIDTH + new_col
+                for new_line in range(max(line - 1, 0),
+                                      min(line + 2, self.GRID_HEIGHT))
+                for new_col in range(max(col - 1, 0),
+                                     min(col + 2, self.GRID_WIDTH))]
+        cells_no = self.GRID_WIDTH * self.GRID_HEIGHT
+        if self.BOMBS_NO <= cells_no - len(area):
+            return area
+        if self.BOMBS_NO < cells_no:
+            return [line * self.GRID_WIDTH + col]
+        return []
+
+    def move_bombs_away(self, line, col):
+        """
+            Moves the bombs of the safe area around the given square to random
+            free cells outside of it. Only the neighbour counts around the
+            moved bombs are updated.
 
             Parameters:
-            - mouse_x (int): The x-coordinate of the mouse click.
-            - mouse_y (int): The y-coordinate of the mouse click.
+            - line (int): The line the square is on.
+            - col (int): The column the square is on.
         """
-        clicked_square, line, col = self.get_clicked_square(mouse_x, mouse_y)
-        if clicked_square is None:
+        area = self.get_safe_area(line, col)
+        moved = [index for index in area if self.cells[index] & BOMB_BIT]
+        if not moved:
             return
-        print(f'square {line}, {col} was clicked')
-        clicked_square.is_opened = True
+        excluded = set(area)
+        cells_no = self.GRID_WIDTH * self.GRID_HEIGHT
+        free_no = cells_no - self.BOMBS_NO - len(area) + len(moved)
+        if free_no * 8 < cells_no:
+            # drawing cells at random would mostly hit bombs
+            free = [index for index in range(cells_no)
+                    if not self.cells[index] & BOMB_BIT
+                    and index not in excluded]
+            targets = self.random.sample(free, len(moved))
+        else:
+            targets = set()
+            while len(targets) < len(moved):
+                index = self.random.randrange(cells_no)
+                if (not self.cells[index] & BOMB_BIT
+                        and index not in excluded):
+                    targets.add(index)
+
+        for index in moved:
+            self.cells[index] &= ~BOMB_BIT
+            self.add_to_bombs_near(index, -1)
+        for index in targets:
+            self.cells[index] |= BOMB_BIT
+            self.add_to_bombs_near(index, 1)
+        LOGGER.debug('moved %d bombs away from the first square',
+                     len(moved))
+
+    def add_to_bombs_near(self, index, delta):
+        """
+            Adds delta to the neighbour counts of the cells around a cell.
+        """
+        i, j = divmod(index, self.GRID_WIDTH)
+        for d_line, d_col in NEIGHBOURS:
+            line, col = i + d_line, j + d_col
+            if 0 <= line < self.GRID_HEIGHT and 0 <= col < self.GRID_WIDTH:
+                self.bombs_near[line * self.GRID_WIDTH + col] += delta
+
+    def generate_bombs(self, excluded=()):
+        """
+            Generates bomb positions within the game grid.
 
-        if clicked_square.is_bomb:
+            Parameters:
+            - excluded (iterable, optional): The indexes of the cells which
+             must not hold a bomb, default none.
+
+            Returns:
+            - list: The indexes, line * GRID_WIDTH + column, of the bombs.
+        """
+        population = range(self.GRID_HEIGHT * self.GRID_WIDTH)
+        if excluded:
+            excluded = set(excluded)
+            population = [index for index in population
+                          if index not in excluded]
+        bombs_pos = self.random.sample(population, self.BOMBS_NO)
+
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            bombs = set(bombs_pos)
+            LOGGER.debug('bombs:\n%s', '\n'.join(
+                '   '.join('X' if i * self.GRID_WIDTH + j in bombs else '0'
+                           for j in range(self.GRID_WIDTH))
+                for i in range(self.GRID_HEIGHT)))
+
+        return bombs_pos
+
+    def compute_neighbour_counts(self, bombs_pos):
+        """
+            Computes the number of adjacent bombs for every cell of the grid.
+            Only the bombs are visited, each one incrementing the counts of
+            its neighbours.
+
+            Parameters:
+            - bombs_pos (list): The indexes of the bombs.
+
+            Returns:
+            - bytearray: The number of bombs adjacent to each cell, indexed by
+             line * GRID_WIDTH + column.
+        """
+        counts = bytearray(self.GRID_HEIGHT * self.GRID_WIDTH)
+        for index in bombs_pos:
+            i, j = divmod(index, self.GRID_WIDTH)
+            for d_line, d_col in NEIGHBOURS:
+                line, col = i + d_line, j + d_col
+                if (0 <= line < self.GRID_HEIGHT
+                        and 0 <= col < self.GRID_WIDTH):
+                    counts[line * self.GRID_WIDTH + col] += 1
+        return counts
+
+    @traced
+    def open(self, line, col):
+        """
+            Opens the square at the given position, revealing the adjacent
+            safe cells if it has no bombs near it. Opening a square which is
+            already opened chords it.
+
+            Parameters:
+            - line (int): The line the square is on.
+            - col (int): The column the square is on.
+
+            Returns:
+            - list: The (line, column) positions of the newly opened cells.
+        """
+        if self.is_opened(line, col):
+            return self.chord(line, col)
+        if self.first_click_safe:
+            self.first_click_safe = False
+            self.move_bombs_away(line, col)
+        revealed = [(line, col)]
+
+        if self.is_bomb(line, col):
+            self.open_square(line, col, CellStatus.BOOM)
             self.is_over = True
             self.reveal_bombs()
-            clicked_square.status = CellStatus.BOOM
         else:
             bombs_no = self.compute_bombs_near(line, col)
-            if bombs_no > 0:
-                clicked_square.status = CellStatus(bombs_no)
-            else:
-                clicked_square.status = CellStatus.SAFE
-                self.reveal_safe_cells(line, col)
+            self.open_square(line, col, STATUSES[bombs_no + 1])
+            if bombs_no == 0:
+                revealed += self.reveal_safe_cells(line, col)
+        return revealed
 
-    def process_right_click(self, mouse_x, mouse_y):
+    def chord(self, line, col):
         """
-            Processes a right-click event on the game grid based on the mouse
-            coordinates.
+            Opens all the unflagged neighbours of an opened number, if it has
+            as many flags around it as bombs.
 
             Parameters:
-            - mouse_x (int): The x-coordinate of the mouse click.
-            - mouse_y (int): The y-coordinate of the mouse click.
-        """
-        clicked_square, line, col = self.get_clicked_square(mouse_x, mouse_y)
-        if clicked_square is None:
-            return
-        if clicked_square.status == CellStatus.UNKNOWN:
-            clicked_square.status = CellStatus.FLAGGED
-            self.flags_no += 1
-        elif clicked_square.status == CellStatus.FLAGGED:
-            clicked_square.status = CellStatus.UNKNOWN
-            self.flags_no -= 1
+            - line (int): The line the square is on.
+            - col (int): The column the square is on.
 
-    def get_clicked_square(self, mouse_x, mouse_y):
+            Returns:
+            - list: The (line, column) positions of the newly opened cells.
+        """
+        if not self.is_opened(line, col) or self.is_bomb(line, col):
+            return []
+        neighbours = self.get_neighbours(line, col)
+        flags_no = sum(self.get_status(*neighbour) == CellStatus.FLAGGED
+                       for neighbour in neighbours)
+        if flags_no != self.compute_bombs_near(line, col):
+            return []
+        return self.open_cells(
+            [neighbour for neighbour in neighbours
+             if self.get_status(*neighbour) == CellStatus.UNKNOWN])
+
+    def open_cells(self, positions):
         """
-            Determines the square clicked based on the mouse coordinates.
+            Opens several squares in one batch, stopping if a bomb is opened.
 
             Parameters:
-            - mouse_x (int): The x-coordinate of the mouse click.
-            - mouse_y (int): The y-coordinate of the mouse click.
+            - positions (list): The (line, column) positions to open.
 
             Returns:
-            - tuple: A tuple containing the clicked square, line, and column if
-             within the grid, or (None, None, None) if the click is outside the
-             grid.
+            - list: The (line, column) positions of all the newly opened
+             cells, with the cascades of every square merged.
+        """
+        revealed = []
+        for line, col in positions:
+            if self.is_over:
+                break
+            if not self.is_opened(line, col):
+                revealed += self.open(line, col)
+        return revealed
+
+    def get_neighbours(self, line, col):
+        return [(line + d_line, col + d_col) for d_line, d_col in NEIGHBOURS
+                if 0 <= line + d_line < self.GRID_HEIGHT
+                and 0 <= col + d_col < self.GRID_WIDTH]
+
+    @traced
+    def flag(self, line, col):
+        """
+            Places or removes a flag on the square at the given position, if
+            it has not been opened.
+
+            Parameters:
+            - line (int): The line the square is on.
+            - col (int): The column the square is on.
         """
-        col, line = (int(mouse_x // self.SQ_SIZE),
-                     int((mouse_y - self.top_bar_height) // self.SQ_SIZE))
-        if line < 0:
-            return None, None, None
-        return self.squares[line][col], line, col
+        status = self.get_status(line, col)
+        if status == CellStatus.UNKNOWN:
+            self.set_status(line, col, CellStatus.FLAGGED)
+            self.flags_no += 1
+        elif status == CellStatus.FLAGGED:
+            self.set_status(line, col, CellStatus.UNKNOWN)
+            self.flags_no -= 1
 
     def compute_bombs_near(self, line, column):
         """
-            Computes the number of bombs adjacent to the given square.
+            Returns the number of bombs adjacent to the given square, as
+            precomputed when the bombs were placed.
 
             Parameters:
             - line (int): The line the square is on.
@@ -185,62 +460,78 @@ class Minesweeper:
             Returns:
             - int: The number of bombs adjacent to the given grid position.
         """
-        bombs_no = 0
-        for dir in Direction:
-            if (0 <= line + dir.value[0] < self.GRID_HEIGHT
-                    and 0 <= column + dir.value[1] < self.GRID_WIDTH
-                    and self.squares[line + dir.value[0]]
-                    [column + dir.value[1]].is_bomb):
-                bombs_no += 1
-        return bombs_no
+        return self.bombs_near[line * self.GRID_WIDTH + column]
+
+    def open_square(self, line, col, status):
+        """
+            Opens a square with the given status, keeping the flags and opened
+            cells counters up to date.
+
+            Parameters:
+            - line (int): The line the square is on.
+            - col (int): The column the square is on.
+            - status (CellStatus): The status the square is shown with.
+        """
+        if self.get_status(line, col) == CellStatus.FLAGGED:
+            self.flags_no -= 1
+        self.set_status(line, col, status)
+        index = line * self.GRID_WIDTH + col
+        if not self.cells[index] & OPENED_BIT:
+            self.cells[index] |= OPENED_BIT
+            if not self.cells[index] & BOMB_BIT:
+                self.opened_no += 1
 
     def reveal_safe_cells(self, x, y):
         """
-            Reveals adjacent safe cells starting from the given square.
+            Reveals adjacent safe cells starting from the given square, which
+            must already be opened. Cells are marked as opened when they are
+            pushed on the stack, so each cell is visited at most once.
 
             Parameters:
             - x (int): The line the square is on.
             - y (int): The column the square is on.
+
+            Returns:
+            - list: The (line, column) positions of the newly opened cells.
         """
-        visited = [[False for _ in range(self.GRID_WIDTH)]
-                   for _ in range(self.GRID_HEIGHT)]
+        revealed = []
         stack = [(x, y)]
 
         while len(stack) > 0:
             x, y = stack.pop()
-            visited[x][y] = True
 
-            for dir in Direction:
-                new_x, new_y = x + dir.value[0], y + dir.value[1]
+            for d_x, d_y in NEIGHBOURS:
+                new_x, new_y = x + d_x, y + d_y
 
                 if (0 <= new_x < self.GRID_HEIGHT
-                        and 0 <= new_y < self.GRID_WIDTH
-                        and not visited[new_x][new_y]):
-                    neighbour = self.squares[new_x][new_y]
+                        and 0 <= new_y < self.GRID_WIDTH):
+                    neighbour = self.cells[new_x * self.GRID_WIDTH + new_y]
+                    if neighbour & (OPENED_BIT | BOMB_BIT):
+                        continue
+
                     bombs_no = self.compute_bombs_near(new_x, new_y)
+                    self.open_square(new_x, new_y, STATUSES[bombs_no + 1])
+                    revealed.append((new_x, new_y))
+                    if bombs_no == 0:
+                        stack.append((new_x, new_y))
 
-                    if not neighbour.is_bomb:
-                        neighbour.status = CellStatus(bombs_no)
-                        neighbour.is_opened = True
-                        if bombs_no == 0:
-                            stack.append((new_x, new_y))
+        return revealed
 
     def reveal_bombs(self):
         """
-            Reveals all bombs.
+            Reveals all bombs that have not been opened. The cells are
+            scanned and changed with bytes.translate, so only the bombs are
+            visited in Python, to record them in changed_cells.
         """
-        for line in self.squares:
-            for square in line:
-                if square.is_bomb:
-                    square.status = CellStatus.BOMB
+        hidden = self.cells.translate(HIDDEN_BOMBS)
+        self.changed_cells += [divmod(match.start(), self.GRID_WIDTH)
+                               for match in re.finditer(b'\x01', hidden)]
+        self.cells = self.cells.translate(REVEALED_CELLS)
 
     def is_won(self):
         """
-           Checks if the game has been won.
+           Checks if the game has been won, that is if every safe cell has
+           been opened without opening a bomb.
         """
-        for line in self.squares:
-            for square in line:
-                if ((not square.is_opened and not square.is_bomb)
-                        or (square.is_opened and square.is_bomb)):
-                    return False
-        return True
+        return (not self.is_over and self.opened_no
+                == self.GRID_WIDTH * self.GRID_HEIGHT - self.BOMBS_NO)
@@ -0,0 +1,44 @@
+import numpy as np
+
+NEIGHBOUR_OFFSETS = [(line, col) for line in (-1, 0, 1) for col in (-1, 0, 1)
+                     if (line, col) != (0, 0)]
+
+
+def generate_bombs(grid_width, grid_height, bombs_no, seed=None):
+    """
+        Places the bombs with a single choice over the flat cell indexes.
+
+        Parameters:
+        - grid_width (int): The width of the game grid.
+        - grid_height (int): The height of the game grid.
+        - bombs_no (int): The number of bombs in the game.
+        - seed (int, optional): The seed of the generator, default None.
+
+        Returns:
+        - numpy.ndarray: A (grid_height, grid_width) uint8 array holding 1
+         where a bomb is placed.
+    """
+    rng = np.random.default_rng(seed)
+    bombs = np.zeros(grid_width * grid_height, dtype=np.uint8)
+    bombs[rng.choice(bombs.size, bombs_no, replace=False)] = 1
+    return bombs.reshape(grid_height, grid_width)
+
+
+def compute_neighbour_counts(bombs):
+    """
+        Computes the number of adjacent bombs for every cell by summing the
+        bombs array shifted in each of the eight directions.
+
+        Parameters:
+        - bombs (numpy.ndarray): The uint8 bombs array.
+
+        Returns:
+        - numpy.ndarray: A uint8 array of the same shape as bombs.
+    """
+    grid_height, grid_width = bombs.shape
+    padded = np.pad(bombs, 1)
+    counts = np.zeros_like(bombs)
+    for line, col in NEIGHBOUR_OFFSETS:
+        counts += padded[1 + line:1 + line + grid_height,
+                         1 + col:1 + col + grid_width]
+    return counts
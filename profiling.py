@@ -0,0 +1,116 @@
+"""
+    Times the phases of the frames of the game loop: handling the events,
+    the game logic, drawing and updating the display. The durations of the
+    last frames are kept to compute rolling percentiles, and every frame can
+    be kept for a trace written as CSV or JSON.
+"""
+import csv
+import json
+import time
+from collections import deque
+
+EVENTS = 'events'
+LOGIC = 'logic'
+DRAW = 'draw'
+DISPLAY = 'display'
+PHASES = (EVENTS, LOGIC, DRAW, DISPLAY)
+
+HISTORY_SIZE = 300
+MAX_TRACE_SIZE = 100000
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    def __init__(self, enabled=False, keep_trace=False):
+        """
+            Splits the time of each frame between the phases it went through.
+            The game loop calls lap after each phase, which adds the time
+            since the previous lap to the phase. When the profiler is
+            disabled, lap returns right away, so it can be left in the loop.
+
+            Parameters:
+            - enabled (bool, optional): Whether frames are timed, default
+             False.
+            - keep_trace (bool, optional): Whether every frame is kept for
+             dump_trace, up to MAX_TRACE_SIZE frames, default False.
+
+            Attributes:
+            - history (deque): The durations in seconds of the phases of the
+             last HISTORY_SIZE frames, by phase.
+            - trace (list): The start time and the phase durations of every
+             frame, None if the trace is not kept.
+        """
+        self.enabled = enabled
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.trace = [] if keep_trace else None
+        self.frame = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = self.last_lap = time.perf_counter()
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.frame = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = self.last_lap = time.perf_counter()
+
+    def lap(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frame[phase] += now - self.last_lap
+        self.last_lap = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.history.append(self.frame)
+        if self.trace is not None and len(self.trace) < MAX_TRACE_SIZE:
+            self.trace.append((self.frame_start, self.frame))
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.history.clear()
+        self.start_frame()
+
+    def get_percentiles(self):
+        """
+            Computes the percentiles of the durations of the phases, and of
+            the whole frames, over the last frames.
+
+            Returns:
+            - dict: The PERCENTILES of each phase and of 'total', in seconds,
+             empty if no frame was timed.
+        """
+        if not self.history:
+            return {}
+        percentiles = {}
+        for phase in (*PHASES, 'total'):
+            if phase == 'total':
+                durations = sorted(sum(frame.values())
+                                   for frame in self.history)
+            else:
+                durations = sorted(frame[phase] for frame in self.history)
+            percentiles[phase] = [
+                durations[min(len(durations) * percentile // 100,
+                              len(durations) - 1)]
+                for percentile in PERCENTILES]
+        return percentiles
+
+    def dump_trace(self, path):
+        """
+            Writes the kept frames to a file, as JSON if its name ends with
+            .json and as CSV otherwise. The times are in milliseconds, the
+            start of each frame being relative to the first one.
+        """
+        if not self.trace:
+            return
+        first_start = self.trace[0][0]
+        rows = [{'start': (start - first_start) * 1000,
+                 **{phase: frame[phase] * 1000 for phase in PHASES}}
+                for start, frame in self.trace]
+        with open(path, 'w', newline='') as file:
+            if path.endswith('.json'):
+                json.dump(rows, file)
+            else:
+                writer = csv.DictWriter(file, ['start', *PHASES])
+                writer.writeheader()
+                writer.writerows(rows)
@@ -0,0 +1,195 @@
+"""
+    A compact binary log of the moves of a game, which can be replayed
+    without a window.
+
+    The file starts with a header: the magic bytes b'MSRP', the format version,
+    the generation mode, a byte of flags, the grid width and height, the
+    number of bombs and the seed of the board. Version 1 files have no
+    generation mode and version 2 files no flags.
+    Each move follows as two unsigned LEB128 varints: the cell index shifted
+    left by one, with the low bit set for flags, and the milliseconds elapsed
+    since the previous move.
+
+    Replay a file with: python replay.py <file>
+"""
+import struct
+import sys
+import time
+
+from board_generation import create_board, Generation
+from game_options import GameOptions
+
+MAGIC = b'MSRP'
+VERSION = 3
+HEADER = struct.Struct('<4sBBBHHIQ')
+HEADER_V2 = struct.Struct('<4sBBHHIQ')
+HEADER_V1 = struct.Struct('<4sBHHIQ')
+
+# the board was generated with NumPy, which gives another board for the seed
+USES_NUMPY = 0x01
+
+OPEN = 0
+FLAG = 1
+
+
+def write_varint(file, value):
+    data = bytearray()
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+    file.write(data)
+
+
+def read_varint(data, offset):
+    """
+        Returns the varint starting at the given offset of data, and the
+        offset right after it.
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class ReplayWriter:
+    def __init__(self, path, game, generation=Generation.RANDOM,
+                 append=False):
+        """
+            Streams the moves of a game to a replay file, flushing each move
+            as it is recorded.
+
+            Parameters:
+            - path (str): The path of the replay file.
+            - game (Minesweeper): The game, which must have been created with
+             an explicit seed.
+            - generation (Generation, optional): How the bombs of the game
+             were placed, default Generation.RANDOM.
+            - append (bool, optional): Appends the moves to an existing
+             replay of the game, such as the replay of a resumed game,
+             default False.
+        """
+        if game.seed is None:
+            raise ValueError('Only games created with a seed can be recorded')
+        self.game = game
+        if append:
+            self.file = open(path, 'ab')
+        else:
+            self.file = open(path, 'wb')
+            flags = USES_NUMPY if game.use_numpy else 0
+            self.file.write(HEADER.pack(MAGIC, VERSION, generation.value,
+                                        flags, game.GRID_WIDTH,
+                                        game.GRID_HEIGHT, game.BOMBS_NO,
+                                        game.seed))
+            self.file.flush()
+        self.last_time = time.monotonic()
+
+    def record(self, action, line, col):
+        """
+            Appends a move to the replay file.
+
+            Parameters:
+            - action (int): OPEN or FLAG.
+            - line (int): The line of the cell.
+            - col (int): The column of the cell.
+        """
+        now = time.monotonic()
+        index = line * self.game.GRID_WIDTH + col
+        write_varint(self.file, index << 1 | action)
+        write_varint(self.file, int((now - self.last_time) * 1000))
+        self.file.flush()
+        self.last_time = now
+
+    def close(self):
+        self.file.close()
+
+
+def read_replay(path):
+    """
+        Reads a replay file.
+
+        Parameters:
+        - path (str): The path of the replay file.
+
+        Returns:
+        - tuple: The header as a dict and the list of moves, each an
+         (action, line, column, milliseconds since the previous move) tuple.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    magic, version = data[:4], data[4]
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a replay file')
+    flags = 0
+    if version == 1:
+        _, _, width, height, bombs_no, seed = HEADER_V1.unpack_from(data)
+        generation = Generation.RANDOM.value
+        offset = HEADER_V1.size
+    elif version == 2:
+        (_, _, generation, width, height, bombs_no,
+         seed) = HEADER_V2.unpack_from(data)
+        offset = HEADER_V2.size
+    elif version == VERSION:
+        (_, _, generation, flags, width, height, bombs_no,
+         seed) = HEADER.unpack_from(data)
+        offset = HEADER.size
+    else:
+        raise ValueError(f'Unsupported replay version {version}')
+
+    moves = []
+    while offset < len(data):
+        try:
+            move, offset = read_varint(data, offset)
+            delay, offset = read_varint(data, offset)
+        except IndexError:
+            # the last move was cut while being written
+            break
+        line, col = divmod(move >> 1, width)
+        moves.append((move & 1, line, col, delay))
+
+    header = {'grid_width': width, 'grid_height': height,
+              'bombs_no': bombs_no, 'seed': seed,
+              'generation': Generation(generation),
+              'use_numpy': bool(flags & USES_NUMPY)}
+    return header, moves
+
+
+def replay(path):
+    """
+        Replays a recorded game as fast as possible.
+
+        Parameters:
+        - path (str): The path of the replay file.
+
+        Returns:
+        - Minesweeper: The game in the state the recording ended in.
+    """
+    header, moves = read_replay(path)
+    game_options = GameOptions(header['grid_width'], header['grid_height'],
+                               header['bombs_no'])
+    game = create_board(game_options, header['seed'], header['generation'],
+                        header['use_numpy'])
+    for action, line, col, _ in moves:
+        if action == OPEN:
+            game.open(line, col)
+        else:
+            game.flag(line, col)
+    return game
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    replayed_game = replay(sys.argv[1])
+    elapsed = time.perf_counter() - start
+    if replayed_game.is_won():
+        outcome = 'won'
+    elif replayed_game.is_over:
+        outcome = 'lost'
+    else:
+        outcome = 'unfinished'
+    print(f'{outcome} game replayed in {elapsed * 1000:.1f} ms')
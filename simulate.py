@@ -0,0 +1,76 @@
+import argparse
+
+import game_options
+from board_generation import (Generation, can_generate_no_guess,
+                              NO_GUESS_MIN_SIZE, NO_GUESS_FREE_CELLS)
+from simulation import run_games_parallel, random_policy, SolverPolicy
+
+PRESETS = {
+    'easy': game_options.EASY,
+    'medium': game_options.MEDIUM,
+    'hard': game_options.HARD,
+}
+
+POLICIES = {
+    'random': random_policy,
+    'solver': SolverPolicy(),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Plays seeded Minesweeper games without a window.')
+    parser.add_argument('difficulty', choices=[*PRESETS, 'custom'])
+    parser.add_argument('--width', type=int, help='columns of a custom board')
+    parser.add_argument('--height', type=int, help='lines of a custom board')
+    parser.add_argument('--bombs', type=int, help='bombs of a custom board')
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first game')
+    parser.add_argument('--policy', choices=POLICIES, default='solver')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes, one per CPU by default')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--numpy', action='store_true',
+                        help='generate the boards with NumPy')
+    parser.add_argument('--generation', default='random',
+                        choices=[generation.name.lower()
+                                 for generation in Generation])
+    args = parser.parse_args()
+
+    if args.difficulty == 'custom':
+        if None in (args.width, args.height, args.bombs):
+            parser.error('custom boards need --width, --height and --bombs')
+        if not 0 < args.bombs < args.width * args.height:
+            parser.error('bombs must be between 1 and the number of cells')
+        if (args.generation == 'no_guess' and not can_generate_no_guess(
+                game_options.GameOptions(args.width, args.height,
+                                         args.bombs))):
+            parser.error('no guess boards need at least '
+                         f'{NO_GUESS_MIN_SIZE} lines and columns and '
+                         f'{NO_GUESS_FREE_CELLS} cells without bombs')
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.difficulty == 'custom':
+        options = game_options.GameOptions(args.width, args.height,
+                                           args.bombs)
+    else:
+        options = PRESETS[args.difficulty]
+
+    results = run_games_parallel(options, args.games, args.seed,
+                                 POLICIES[args.policy], args.numpy,
+                                 Generation[args.generation.upper()],
+                                 args.workers, args.chunk_size)
+    games = results['games']
+    print(f'games:          {games}')
+    print(f'win rate:       {results["wins"] / games:.4f}')
+    print(f'moves per game: {results["moves"] / games:.2f}')
+    print(f'seconds:        {results["seconds"]:.2f}')
+    print(f'games/second:   {results["games_per_second"]:.1f}')
+
+
+if __name__ == '__main__':
+    main()
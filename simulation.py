@@ -0,0 +1,177 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from board_generation import create_board, Generation
+from minesweeper import CellStatus
+from solver import Solver
+
+
+def random_policy(game, rng, revealed, excluded=()):
+    """
+        Chooses a random square which has not been opened or flagged.
+
+        Parameters:
+        - game (Minesweeper): The game being played.
+        - rng (random.Random): The random generator of the game.
+        - revealed (list): The positions opened by the previous move.
+        - excluded (set, optional): Indexes of squares not to choose.
+
+        Returns:
+        - tuple: The line and column of the square to open.
+    """
+    while True:
+        line = rng.randrange(game.GRID_HEIGHT)
+        col = rng.randrange(game.GRID_WIDTH)
+        if (game.get_status(line, col) == CellStatus.UNKNOWN
+                and line * game.GRID_WIDTH + col not in excluded):
+            return line, col
+
+
+class SolverPolicy:
+    def __init__(self):
+        """
+            Opens the cells the solver knows to be safe. When there are none,
+            opens the frontier cell least likely to be a bomb, or a random
+            interior cell if the interior is safer.
+        """
+        self.solver = None
+
+    def __call__(self, game, rng, revealed):
+        if self.solver is None or self.solver.game is not game:
+            self.solver = Solver(game)
+        else:
+            self.solver.update(revealed)
+
+        safe, _ = self.solver.find_moves()
+        if safe:
+            return safe[0]
+
+        probabilities, interior_probability = (
+            self.solver.compute_probabilities())
+        frontier = [(probability, position)
+                    for position, probability in probabilities.items()
+                    if probability < 1]
+        best = min(frontier, default=None)
+        if best is not None and (interior_probability is None
+                                 or best[0] <= interior_probability):
+            return best[1]
+        excluded = {line * game.GRID_WIDTH + col
+                    for line, col in probabilities}
+        return random_policy(game, rng, revealed, excluded)
+
+
+def play_game(game_options, seed, policy=random_policy, use_numpy=False,
+              generation=Generation.RANDOM):
+    """
+        Plays a game on the board generated from the given seed until it is
+        won or lost.
+
+        Parameters:
+        - game_options (GameOptions): The configuration of the board.
+        - seed (int): The seed of the board and of the policy's choices.
+        - policy (function, optional): Chooses the next square to open given
+         the game, a random generator and the positions opened by the
+         previous move, default random_policy.
+        - use_numpy (bool, optional): Generates the board with NumPy,
+         default False.
+        - generation (Generation, optional): How the bombs are placed,
+         default Generation.RANDOM.
+
+        Returns:
+        - tuple: Whether the game was won and the number of moves played.
+    """
+    game = create_board(game_options, seed, generation, use_numpy)
+    rng = random.Random(seed)
+    moves_no = 0
+    revealed = []
+    while not game.is_over and not game.is_won():
+        line, col = policy(game, rng, revealed)
+        revealed = game.open(line, col)
+        moves_no += 1
+    return game.is_won(), moves_no
+
+
+def run_games(game_options, games_no, first_seed=0, policy=random_policy,
+              use_numpy=False, generation=Generation.RANDOM):
+    """
+        Plays games on consecutive seeds, without a window.
+
+        Parameters:
+        - game_options (GameOptions): The configuration of the boards.
+        - games_no (int): The number of games to play.
+        - first_seed (int, optional): The seed of the first game, default 0.
+        - policy (function, optional): Chooses the next square to open,
+         default random_policy.
+        - use_numpy (bool, optional): Generates the boards with NumPy,
+         default False.
+        - generation (Generation, optional): How the bombs are placed,
+         default Generation.RANDOM.
+
+        Returns:
+        - dict: The number of games, wins and moves, the time taken in
+         seconds and the number of games played per second.
+    """
+    wins = moves = 0
+    start = time.perf_counter()
+    for seed in range(first_seed, first_seed + games_no):
+        is_won, moves_no = play_game(game_options, seed, policy, use_numpy,
+                                     generation)
+        wins += is_won
+        moves += moves_no
+    elapsed = time.perf_counter() - start
+
+    return {
+        'games': games_no,
+        'wins': wins,
+        'moves': moves,
+        'seconds': elapsed,
+        'games_per_second': games_no / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def run_games_parallel(game_options, games_no, first_seed=0,
+                       policy=random_policy, use_numpy=False,
+                       generation=Generation.RANDOM, workers=None,
+                       chunk_size=1000):
+    """
+        Plays games on consecutive seeds across a pool of processes. Every
+        game only depends on its seed, so the results are the same for any
+        number of workers.
+
+        Parameters:
+        - game_options (GameOptions): The configuration of the boards.
+        - games_no (int): The number of games to play.
+        - first_seed (int, optional): The seed of the first game, default 0.
+        - policy (function, optional): Chooses the next square to open, must
+         be picklable, default random_policy.
+        - use_numpy (bool, optional): Generates the boards with NumPy,
+         default False.
+        - generation (Generation, optional): How the bombs are placed,
+         default Generation.RANDOM.
+        - workers (int, optional): The number of processes, default None for
+         one per CPU.
+        - chunk_size (int, optional): The number of games sent to a process
+         at once, default 1000.
+
+        Returns:
+        - dict: The same statistics as run_games, with the wall-clock time.
+    """
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run_games, game_options,
+                            min(chunk_size, first_seed + games_no - seed),
+                            seed, policy, use_numpy, generation)
+            for seed in range(first_seed, first_seed + games_no, chunk_size)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    return {
+        'games': games_no,
+        'wins': sum(result['wins'] for result in results),
+        'moves': sum(result['moves'] for result in results),
+        'seconds': elapsed,
+        'games_per_second': games_no / elapsed if elapsed > 0 else 0.0,
+    }
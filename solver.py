@@ -0,0 +1,435 @@
+from math import comb
+
+from minesweeper import OPENED_BIT
+
+COMPONENT_CACHE_SIZE = 4096
+
+
+class Constraint:
+    __slots__ = ('cells', 'mines')
+
+    def __init__(self, cells, mines):
+        """
+            States that exactly `mines` of the given unknown cells are bombs.
+
+            Parameters:
+            - cells (set): The indexes of the unknown cells.
+            - mines (int): The number of bombs among them.
+        """
+        self.cells = cells
+        self.mines = mines
+
+
+class Solver:
+    def __init__(self, game, max_component_size=24):
+        """
+            Finds the cells of a Minesweeper game which are certainly safe or
+            certainly bombs, from the numbers of the opened cells. Flags
+            placed by the player are not trusted, since they may be wrong.
+
+            Every opened cell with unknown neighbours gives a constraint. The
+            constraints are kept between moves and only the ones touched by
+            newly opened cells are examined again, with the trivial rules and
+            the subset rule. When that finds no safe cell, the frontier is
+            split into independent components which are enumerated exactly.
+
+            Parameters:
+            - game (Minesweeper): The game to solve.
+            - max_component_size (int, optional): Components with more cells
+             are not enumerated, default 24.
+
+            Attributes:
+            - constraints (dict): The constraints, by the index of the opened
+             cell they come from.
+            - watchers (dict): The indexes of the constraints each unknown
+             cell is part of.
+            - safe (set): The indexes of the cells known to be safe which
+             have not been opened yet.
+            - mines (set): The indexes of the cells known to be bombs.
+            - component_cache (dict): The enumerations of components, by the
+             constraints they are made of, so unchanged components are not
+             enumerated again.
+        """
+        self.game = game
+        self.width = game.GRID_WIDTH
+        self.height = game.GRID_HEIGHT
+        self.max_component_size = max_component_size
+        self.constraints = {}
+        self.watchers = {}
+        self.safe = set()
+        self.mines = set()
+        self.worklist = set()
+        self.component_cache = {}
+        self.update([divmod(index, self.width)
+                     for index, cell in enumerate(game.cells)
+                     if cell & OPENED_BIT])
+
+    def get_neighbours(self, index):
+        line, col = divmod(index, self.width)
+        return [new_line * self.width + new_col
+                for new_line in range(max(line - 1, 0),
+                                      min(line + 2, self.height))
+                for new_col in range(max(col - 1, 0),
+                                     min(col + 2, self.width))
+                if new_line != line or new_col != col]
+
+    def update(self, revealed):
+        """
+            Takes the newly opened cells into account.
+
+            Parameters:
+            - revealed (list): The (line, column) positions of the cells
+             opened since the last update.
+        """
+        cells = self.game.cells
+        for line, col in revealed:
+            index = line * self.width + col
+            self.safe.discard(index)
+            self.remove_cell(index, is_mine=False)
+
+        for line, col in revealed:
+            index = line * self.width + col
+            if self.game.is_bomb(line, col):
+                continue
+            unknown = set()
+            mines = self.game.compute_bombs_near(line, col)
+            for neighbour in self.get_neighbours(index):
+                if neighbour in self.mines:
+                    mines -= 1
+                elif (not cells[neighbour] & OPENED_BIT
+                        and neighbour not in self.safe):
+                    unknown.add(neighbour)
+            if unknown:
+                self.constraints[index] = Constraint(unknown, mines)
+                for cell in unknown:
+                    self.watchers.setdefault(cell, set()).add(index)
+                self.worklist.add(index)
+
+    def remove_cell(self, index, is_mine):
+        """
+            Removes a cell whose content is known from the constraints it is
+            part of.
+
+            Parameters:
+            - index (int): The index of the cell.
+            - is_mine (bool): Whether the cell is a bomb.
+        """
+        for key in self.watchers.pop(index, ()):
+            constraint = self.constraints[key]
+            constraint.cells.discard(index)
+            if is_mine:
+                constraint.mines -= 1
+            self.worklist.add(key)
+
+    def remove_bombs(self, cells):
+        """
+            Takes into account that bombs were moved away from undecided
+            cells, which lowers the constraints they are part of.
+
+            Parameters:
+            - cells (list): The indexes of the cells, which must be part of
+             constraints.
+        """
+        for cell in cells:
+            for key in self.watchers[cell]:
+                self.constraints[key].mines -= 1
+                self.worklist.add(key)
+
+    def mark_safe(self, cells):
+        for cell in list(cells):
+            if cell not in self.safe:
+                self.safe.add(cell)
+                self.remove_cell(cell, is_mine=False)
+
+    def mark_mines(self, cells):
+        for cell in list(cells):
+            if cell not in self.mines:
+                self.mines.add(cell)
+                self.remove_cell(cell, is_mine=True)
+
+    def propagate(self):
+        """
+            Applies the trivial and subset rules to the constraints in the
+            worklist until no more cells can be deduced.
+        """
+        while self.worklist:
+            key = self.worklist.pop()
+            constraint = self.constraints.get(key)
+            if constraint is None:
+                continue
+            if not constraint.cells:
+                del self.constraints[key]
+                continue
+            if constraint.mines == 0:
+                self.mark_safe(constraint.cells)
+                continue
+            if constraint.mines == len(constraint.cells):
+                self.mark_mines(constraint.cells)
+                continue
+
+            others = set()
+            for cell in constraint.cells:
+                others |= self.watchers[cell]
+            others.discard(key)
+            for other_key in others:
+                other = self.constraints.get(other_key)
+                if other is None or key not in self.constraints:
+                    continue
+                if constraint.cells <= other.cells:
+                    self.apply_subset(other, constraint)
+                elif other.cells <= constraint.cells:
+                    self.apply_subset(constraint, other)
+
+    def apply_subset(self, constraint, subset):
+        """
+            Deduces the cells of a constraint which are not in one of its
+            subsets, when they are either all safe or all bombs.
+        """
+        difference = constraint.cells - subset.cells
+        if not difference:
+            return
+        mines = constraint.mines - subset.mines
+        if mines == 0:
+            self.mark_safe(difference)
+        elif mines == len(difference):
+            self.mark_mines(difference)
+
+    def get_components(self):
+        """
+            Splits the constraints into groups which share no unknown cell.
+
+            Returns:
+            - list: The (cells, constraint indexes) of every component.
+        """
+        seen_keys = set()
+        seen_cells = set()
+        components = []
+        for first_key in self.constraints:
+            if first_key in seen_keys:
+                continue
+            seen_keys.add(first_key)
+            keys, cells = [], []
+            queue = [first_key]
+            while queue:
+                key = queue.pop()
+                keys.append(key)
+                for cell in self.constraints[key].cells:
+                    if cell in seen_cells:
+                        continue
+                    seen_cells.add(cell)
+                    cells.append(cell)
+                    for other_key in self.watchers[cell]:
+                        if other_key not in seen_keys:
+                            seen_keys.add(other_key)
+                            queue.append(other_key)
+            components.append((cells, keys))
+        return components
+
+    def enumerate_component(self, cells, keys):
+        """
+            Enumerates every assignment of bombs to the cells of a component
+            which satisfies its constraints.
+
+            Parameters:
+            - cells (list): The indexes of the cells of the component.
+            - keys (list): The indexes of its constraints.
+
+            Returns:
+            - dict: For every possible number of bombs in the component, the
+             number of assignments and, for each cell, the number of
+             assignments in which it is a bomb.
+        """
+        position = {cell: i for i, cell in enumerate(cells)}
+        cell_constraints = [[] for _ in cells]
+        mines_left = []
+        cells_left = []
+        for constraint_no, key in enumerate(keys):
+            constraint = self.constraints[key]
+            for cell in constraint.cells:
+                cell_constraints[position[cell]].append(constraint_no)
+            mines_left.append(constraint.mines)
+            cells_left.append(len(constraint.cells))
+
+        assignment = [False] * len(cells)
+        results = {}
+
+        def backtrack(i, mines_no):
+            if i == len(cells):
+                result = results.get(mines_no)
+                if result is None:
+                    result = results[mines_no] = [0, [0] * len(cells)]
+                result[0] += 1
+                counts = result[1]
+                for j, is_mine in enumerate(assignment):
+                    if is_mine:
+                        counts[j] += 1
+                return
+
+            for is_mine in (False, True):
+                is_valid = True
+                for constraint_no in cell_constraints[i]:
+                    cells_left[constraint_no] -= 1
+                    mines_left[constraint_no] -= is_mine
+                    if not (0 <= mines_left[constraint_no]
+                            <= cells_left[constraint_no]):
+                        is_valid = False
+                if is_valid:
+                    assignment[i] = is_mine
+                    backtrack(i + 1, mines_no + is_mine)
+                for constraint_no in cell_constraints[i]:
+                    cells_left[constraint_no] += 1
+                    mines_left[constraint_no] += is_mine
+            assignment[i] = False
+
+        backtrack(0, 0)
+        return results
+
+    def get_component_results(self, cells, keys):
+        """
+            Returns the enumeration of a component, from the cache if its
+            constraints were already enumerated.
+
+            Returns:
+            - tuple: The cells of the component, in the order of the counts of
+             the results, and the results of enumerate_component.
+        """
+        signature = frozenset((frozenset(self.constraints[key].cells),
+                               self.constraints[key].mines) for key in keys)
+        cached = self.component_cache.get(signature)
+        if cached is None:
+            if len(self.component_cache) >= COMPONENT_CACHE_SIZE:
+                self.component_cache.clear()
+            cached = (cells, self.enumerate_component(cells, keys))
+            self.component_cache[signature] = cached
+        return cached
+
+    def solve_components(self):
+        """
+            Enumerates the components of the frontier which are small enough
+            and marks the cells which are bombs in all or none of their
+            assignments.
+        """
+        for cells, keys in self.get_components():
+            if len(cells) > self.max_component_size:
+                continue
+            cells, results = self.get_component_results(cells, keys)
+            total = sum(solutions for solutions, _ in results.values())
+            if total == 0:
+                continue
+            counts = [sum(result[1][i] for result in results.values())
+                      for i in range(len(cells))]
+            self.mark_safe(cell for cell, count in zip(cells, counts)
+                           if count == 0)
+            self.mark_mines(cell for cell, count in zip(cells, counts)
+                            if count == total)
+        self.propagate()
+
+    def find_moves(self):
+        """
+            Deduces what can be deduced from the current state of the game.
+
+            Returns:
+            - tuple: The sorted (line, column) positions of the cells which
+             are certainly safe and of the cells which are certainly bombs.
+        """
+        self.propagate()
+        if not self.safe:
+            self.solve_components()
+        return ([divmod(index, self.width) for index in sorted(self.safe)],
+                [divmod(index, self.width) for index in sorted(self.mines)])
+
+    def compute_probabilities(self):
+        """
+            Computes the probability of every unknown cell to be a bomb. The
+            assignments of each component are weighted by the number of ways
+            to place the remaining bombs in the interior, the unknown cells
+            which no opened cell touches. Components too large to enumerate
+            are counted as interior.
+
+            Returns:
+            - tuple: A dict of the probabilities of the frontier cells and of
+             the cells known to be safe or bombs, by (line, column), and the
+             probability shared by every interior cell, None if there are no
+             interior cells.
+        """
+        self.propagate()
+        probabilities = dict.fromkeys(self.safe, 0.0)
+        probabilities.update(dict.fromkeys(self.mines, 1.0))
+
+        components = []
+        frontier_size = 0
+        for cells, keys in self.get_components():
+            if len(cells) <= self.max_component_size:
+                cells, results = self.get_component_results(cells, keys)
+                components.append((cells, results))
+                frontier_size += len(cells)
+
+        unknown_no = self.width * self.height - self.game.opened_no
+        interior_no = unknown_no - len(probabilities) - frontier_size
+        mines_left = self.game.BOMBS_NO - len(self.mines)
+
+        def weight(frontier_mines):
+            interior_mines = mines_left - frontier_mines
+            if 0 <= interior_mines <= interior_no:
+                return comb(interior_no, interior_mines)
+            return 0
+
+        distributions = [{mines_no: result[0]
+                          for mines_no, result in results.items()}
+                         for _, results in components]
+        prefixes = [{0: 1}]
+        for distribution in distributions:
+            prefixes.append(convolve(prefixes[-1], distribution, mines_left))
+        suffixes = [{0: 1}]
+        for distribution in reversed(distributions):
+            suffixes.append(convolve(suffixes[-1], distribution, mines_left))
+        suffixes.reverse()
+
+        total = sum(solutions * weight(mines_no)
+                    for mines_no, solutions in prefixes[-1].items())
+        if total == 0:
+            unknown_no -= len(probabilities)
+            return self.to_positions(probabilities), (
+                mines_left / unknown_no if unknown_no > 0 else None)
+
+        for i, (cells, results) in enumerate(components):
+            others = convolve(prefixes[i], suffixes[i + 1], mines_left)
+            mine_weights = [0] * len(cells)
+            for mines_no, (_, counts) in results.items():
+                mines_weight = sum(solutions * weight(mines_no + others_no)
+                                   for others_no, solutions in others.items())
+                for j, count in enumerate(counts):
+                    mine_weights[j] += count * mines_weight
+            for cell, mine_weight in zip(cells, mine_weights):
+                probabilities[cell] = mine_weight / total
+
+        interior_probability = None
+        if interior_no > 0:
+            interior_probability = sum(
+                solutions * weight(mines_no) * (mines_left - mines_no)
+                for mines_no, solutions in prefixes[-1].items()
+            ) / (total * interior_no)
+        return self.to_positions(probabilities), interior_probability
+
+    def to_positions(self, probabilities):
+        return {divmod(index, self.width): probability
+                for index, probability in probabilities.items()}
+
+
+def convolve(first, second, max_mines):
+    """
+        Combines two distributions of assignment counts by number of bombs.
+
+        Parameters:
+        - first (dict): Assignment counts by number of bombs.
+        - second (dict): Assignment counts by number of bombs.
+        - max_mines (int): Larger numbers of bombs are dropped.
+    """
+    result = {}
+    for first_mines, first_count in first.items():
+        for second_mines, second_count in second.items():
+            mines_no = first_mines + second_mines
+            if mines_no <= max_mines:
+                result[mines_no] = (result.get(mines_no, 0)
+                                    + first_count * second_count)
+    return result
@@ -1,10 +1,18 @@
+import os
+
 import pygame
 import pygame_menu
 import game_options
-from gamehandler import GameHandler
+from board_generation import (Generation, can_generate_no_guess,
+                              NO_GUESS_MIN_SIZE, NO_GUESS_FREE_CELLS)
+from gamehandler import GameHandler, load_saved_game, SAVE_PATH
 
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 500
+# larger boards are scrolled through a viewport, up to the largest size the
+# benchmarks cover
+MAX_LINES = 1000
+MAX_COLUMNS = 1000
 
 
 def menu_loop():
@@ -30,19 +38,41 @@ def menu_loop():
                 return
             difficulty = game_options.GameOptions(columns, lines, bombs)
 
-        game_handler = GameHandler(difficulty, is_timed, time_limit)
+        generation = generation_selector.get_value()[0][1]
+        if (generation == Generation.NO_GUESS
+                and not can_generate_no_guess(difficulty)):
+            show_validation_error(
+                f'No guessing needs at least {NO_GUESS_MIN_SIZE} lines and '
+                f'columns and {NO_GUESS_FREE_CELLS} cells without bombs')
+            return
+        game_handler = GameHandler(difficulty, is_timed, time_limit,
+                                   generation)
         game_handler.game_loop()
         pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        update_resume_button()
+
+    def resume_onclick():
+        game_handler = load_saved_game()
+        if game_handler is not None:
+            game_handler.game_loop()
+            pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        update_resume_button()
+
+    def update_resume_button():
+        if os.path.exists(SAVE_PATH):
+            resume_button.show()
+        else:
+            resume_button.hide()
 
     def check_valid_options(lines, columns, bombs):
         if lines <= 0:
             return 'Enter a valid number of lines'
-        if lines > 30:
-            return 'Lines should be less than 30'
+        if lines > MAX_LINES:
+            return f'Lines should be at most {MAX_LINES}'
         if columns <= 0:
             return 'Enter a valid number of columns'
-        if columns > 64:
-            return 'Columns should be less than 64'
+        if columns > MAX_COLUMNS:
+            return f'Columns should be at most {MAX_COLUMNS}'
         if bombs <= 0:
             return 'There must be more at least one bomb'
         if bombs > lines * columns:
@@ -104,22 +134,31 @@ def menu_loop():
         onchange=select_difficulty
     )
 
+    generation_selector = menu.add.selector(
+        title='Board:\t',
+        items=[
+            ('Random', Generation.RANDOM),
+            ('Safe first click', Generation.FIRST_CLICK_SAFE),
+            ('No guessing', Generation.NO_GUESS)
+        ]
+    )
+
     lines_input = menu.add.text_input('Lines: ',
                                       input_type=pygame_menu.locals.INPUT_INT,
                                       input_underline='_',
-                                      maxchar=3)
+                                      maxchar=4)
     lines_input.hide()
     columns_input = (
         menu.add.text_input('Columns: ',
                             input_type=pygame_menu.locals.INPUT_INT,
                             input_underline='_',
-                            maxchar=3)
+                            maxchar=4)
     )
     columns_input.hide()
     bombs_input = menu.add.text_input('Bombs: ',
                                       input_type=pygame_menu.locals.INPUT_INT,
                                       input_underline='_',
-                                      maxchar=5)
+                                      maxchar=7)
     bombs_input.hide()
 
     not_timed_mode = menu.add.button('Not Timed Mode',
@@ -137,6 +176,8 @@ def menu_loop():
 
     menu.add.button('Submit', submit_onclick,
                     background_color=(47, 48, 51), font_color=(255, 255, 255))
+    resume_button = menu.add.button('Resume saved game', resume_onclick)
+    update_resume_button()
 
     menu.mainloop(surface)
 
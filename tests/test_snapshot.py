@@ -0,0 +1,71 @@
+import pytest
+
+from board_generation import Generation
+from minesweeper import Minesweeper
+from snapshot import dump_snapshot, load_snapshot
+
+
+def find_cell(game, is_bomb):
+    for index in range(game.GRID_WIDTH * game.GRID_HEIGHT):
+        line, col = divmod(index, game.GRID_WIDTH)
+        if (game.is_bomb(line, col) == is_bomb
+                and not game.is_opened(line, col)):
+            return line, col
+    raise ValueError('no such cell')
+
+
+def assert_same_game(loaded, game):
+    assert (loaded.GRID_WIDTH, loaded.GRID_HEIGHT, loaded.BOMBS_NO) == (
+        game.GRID_WIDTH, game.GRID_HEIGHT, game.BOMBS_NO)
+    assert loaded.seed == game.seed
+    assert loaded.cells == game.cells
+    assert loaded.bombs_near == game.bombs_near
+    assert loaded.opened_no == game.opened_no
+    assert loaded.flags_no == game.flags_no
+    assert loaded.is_over == game.is_over
+    assert loaded.first_click_safe == game.first_click_safe
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_round_trip_game_in_progress(seed):
+    game = Minesweeper(16, 16, 40, seed=seed)
+    game.open(*find_cell(game, is_bomb=False))
+    game.flag(*find_cell(game, is_bomb=True))
+    game.flag(*find_cell(game, is_bomb=False))
+
+    loaded, info = load_snapshot(dump_snapshot(
+        game, Generation.NO_GUESS, elapsed_ms=1234, time_limit=60))
+    assert_same_game(loaded, game)
+    assert info == {'generation': Generation.NO_GUESS, 'elapsed_ms': 1234,
+                    'time_limit': 60}
+
+
+def test_round_trip_lost_game():
+    game = Minesweeper(9, 7, 10, seed=1)
+    game.flag(*find_cell(game, is_bomb=True))
+    game.open(*find_cell(game, is_bomb=False))
+    game.open(*find_cell(game, is_bomb=True))
+
+    loaded, info = load_snapshot(dump_snapshot(game))
+    assert loaded.is_over
+    assert_same_game(loaded, game)
+    assert info['time_limit'] is None
+
+
+def test_round_trip_first_click_safe_before_the_first_click():
+    game = Minesweeper(8, 8, 10, seed=2, first_click_safe=True)
+
+    loaded, info = load_snapshot(dump_snapshot(
+        game, Generation.FIRST_CLICK_SAFE))
+    assert_same_game(loaded, game)
+    assert info['generation'] == Generation.FIRST_CLICK_SAFE
+    loaded.open(0, 0)
+    assert loaded.opened_no > 0 and not loaded.is_over
+
+
+def test_truncated_snapshot_is_rejected():
+    data = dump_snapshot(Minesweeper(8, 8, 10, seed=3))
+    with pytest.raises(ValueError):
+        load_snapshot(data[:-1])
+    with pytest.raises(ValueError):
+        load_snapshot(data[:10])
@@ -0,0 +1,86 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from game_options import EASY, MEDIUM, HARD
+from minesweeper import Minesweeper, OPENED_BIT
+from solver import Solver
+
+
+def open_random_safe_cell(game, rng):
+    """
+        Opens a random unopened cell which is not a bomb, as a player who
+        guessed right would.
+    """
+    cells = [divmod(index, game.GRID_WIDTH)
+             for index in range(game.GRID_WIDTH * game.GRID_HEIGHT)]
+    line, col = rng.choice([(line, col) for line, col in cells
+                            if not game.is_opened(line, col)
+                            and not game.is_bomb(line, col)])
+    return game.open(line, col)
+
+
+@pytest.mark.parametrize('game_options', [EASY, MEDIUM, HARD])
+@pytest.mark.parametrize('seed', range(50))
+def test_find_moves_is_sound(game_options, seed):
+    game = Minesweeper(game_options.grid_width, game_options.grid_height,
+                       game_options.bombs_no, seed=seed)
+    rng = random.Random(seed)
+    open_random_safe_cell(game, rng)
+    solver = Solver(game)
+
+    while not game.is_won():
+        safe, mines = solver.find_moves()
+        assert not any(game.is_bomb(line, col) for line, col in safe)
+        assert all(game.is_bomb(line, col) for line, col in mines)
+        revealed = []
+        if not safe:
+            revealed += open_random_safe_cell(game, rng)
+        for line, col in safe:
+            if not game.is_opened(line, col):
+                revealed += game.open(line, col)
+        assert not game.is_over
+        solver.update(revealed)
+
+
+def brute_force_probabilities(game, solver):
+    """
+        Computes the probability of every unopened cell to be a bomb by
+        enumerating every placement of the bombs which matches the numbers of
+        the opened cells.
+    """
+    opened = [index for index, cell in enumerate(game.cells)
+              if cell & OPENED_BIT]
+    unknown = [index for index, cell in enumerate(game.cells)
+               if not cell & OPENED_BIT]
+    neighbours = {index: solver.get_neighbours(index) for index in opened}
+    bomb_counts = dict.fromkeys(unknown, 0)
+    solutions = 0
+    for bombs in combinations(unknown, game.BOMBS_NO):
+        bombs = set(bombs)
+        if all(sum(neighbour in bombs for neighbour in neighbours[index])
+               == game.bombs_near[index] for index in opened):
+            solutions += 1
+            for index in bombs:
+                bomb_counts[index] += 1
+    return {divmod(index, game.GRID_WIDTH): count / solutions
+            for index, count in bomb_counts.items()}
+
+
+@pytest.mark.parametrize('size', [(4, 4, 3), (5, 4, 5), (6, 3, 4)])
+@pytest.mark.parametrize('seed', range(20))
+def test_compute_probabilities_matches_brute_force(size, seed):
+    game = Minesweeper(*size, seed=seed)
+    rng = random.Random(seed)
+    solver = Solver(game)
+    for _ in range(2):
+        if game.is_won():
+            break
+        solver.update(open_random_safe_cell(game, rng))
+
+        probabilities, interior_probability = solver.compute_probabilities()
+        for position, expected in brute_force_probabilities(
+                game, solver).items():
+            probability = probabilities.get(position, interior_probability)
+            assert probability == pytest.approx(expected)
@@ -0,0 +1,131 @@
+import math
+
+ZOOM_LEVELS = (0.25, 0.375, 0.5, 0.75, 1, 1.5, 2)
+DEFAULT_ZOOM = ZOOM_LEVELS.index(1)
+
+
+class Viewport:
+    def __init__(self, grid_width, grid_height, width, height, top, sq_size):
+        """
+            The part of the grid shown in the area of the window below the top
+            bar, which can be scrolled and zoomed. Scrolling moves by whole
+            cells, so the first visible cell is always drawn whole.
+
+            Parameters:
+            - grid_width (int): The width of the game grid.
+            - grid_height (int): The height of the game grid.
+            - width (int): The width of the shown area in pixels.
+            - height (int): The height of the shown area in pixels.
+            - top (int): The y-coordinate of the top of the shown area.
+            - sq_size (int): The size of a square at the default zoom.
+
+            Attributes:
+            - first_line (int): The first line shown.
+            - first_col (int): The first column shown.
+            - zoom (int): The index of the zoom level in ZOOM_LEVELS.
+        """
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.width = width
+        self.height = height
+        self.top = top
+        self.base_sq_size = sq_size
+        self.first_line = 0
+        self.first_col = 0
+        self.zoom = DEFAULT_ZOOM
+
+    @property
+    def sq_size(self):
+        return max(round(self.base_sq_size * ZOOM_LEVELS[self.zoom]), 1)
+
+    @property
+    def lines_no(self):
+        """
+            The number of lines shown, counting the last one which may be cut.
+        """
+        return min(math.ceil(self.height / self.sq_size),
+                   self.grid_height - self.first_line)
+
+    @property
+    def cols_no(self):
+        """
+            The number of columns shown, counting the last one which may be
+            cut.
+        """
+        return min(math.ceil(self.width / self.sq_size),
+                   self.grid_width - self.first_col)
+
+    @property
+    def cells_no(self):
+        return self.lines_no * self.cols_no
+
+    def get_visible_lines(self):
+        return range(self.first_line, self.first_line + self.lines_no)
+
+    def get_visible_cols(self):
+        return range(self.first_col, self.first_col + self.cols_no)
+
+    def is_visible(self, line, col):
+        return (self.first_line <= line < self.first_line + self.lines_no
+                and self.first_col <= col < self.first_col + self.cols_no)
+
+    def get_square_position(self, line, col):
+        """
+            Returns the position on the screen of the square on the given line
+            and column.
+        """
+        return ((col - self.first_col) * self.sq_size,
+                (line - self.first_line) * self.sq_size + self.top)
+
+    def get_square_at(self, x, y):
+        """
+            Returns the line and column of the square shown at the given
+            position on the screen, or None if there is none.
+        """
+        if not 0 <= x < self.width or not 0 <= y - self.top < self.height:
+            return None
+        line = self.first_line + (y - self.top) // self.sq_size
+        col = self.first_col + x // self.sq_size
+        if line >= self.grid_height or col >= self.grid_width:
+            return None
+        return line, col
+
+    def scroll(self, lines, cols):
+        """
+            Moves the viewport by the given number of lines and columns,
+            without going past the edges of the grid.
+
+            Returns:
+            - bool: Whether the viewport moved.
+        """
+        first_line, first_col = self.first_line, self.first_col
+        self.first_line = self.clamp(self.first_line + lines,
+                                     self.grid_height, self.height)
+        self.first_col = self.clamp(self.first_col + cols,
+                                    self.grid_width, self.width)
+        return (first_line, first_col) != (self.first_line, self.first_col)
+
+    def zoom_by(self, steps, x, y):
+        """
+            Changes the zoom level by the given number of steps, keeping the
+            square under the given position of the screen in place.
+
+            Returns:
+            - bool: Whether the zoom level changed.
+        """
+        zoom = min(max(self.zoom + steps, 0), len(ZOOM_LEVELS) - 1)
+        if zoom == self.zoom:
+            return False
+        y -= self.top
+        line = self.first_line + y / self.sq_size
+        col = self.first_col + x / self.sq_size
+        self.zoom = zoom
+        self.first_line = 0
+        self.first_col = 0
+        self.scroll(round(line - y / self.sq_size),
+                    round(col - x / self.sq_size))
+        return True
+
+    def clamp(self, first, cells_no, size):
+        last_first = max(cells_no - size // self.sq_size, 0)
+        return min(max(first, 0), last_first)